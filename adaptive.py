@@ -0,0 +1,203 @@
+import email.utils
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+# Réponses signalant que le serveur demande de ralentir
+THROTTLE_STATUSES = (429, 503)
+
+INITIAL_CONCURRENCY = 4      # requêtes simultanées par hôte au démarrage
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+TARGET_P95 = 3.0             # latence p95 (s) au-delà de laquelle on réduit la concurrence
+LATENCY_WINDOW = 50          # nombre de réponses prises en compte pour le p95
+MIN_SAMPLES = 10             # échantillons nécessaires avant de réagir à la latence
+THROTTLE_PAUSE = 1.0         # pause (s) après un 429/503 sans Retry-After
+RATE_STEP = 0.1              # hausse du débit par seconde sans ralentissement, en fraction de la limite configurée
+MIN_RATE = 0.1               # débit minimal par hôte (requêtes/s)
+MAX_RATE_FACTOR = 4.0        # débit maximal d'un site : ce multiple de sa limite configurée (hôtes protégés : 1)
+
+
+def parse_retry_after(value):
+    """Durée d'attente (s) indiquée par un en-tête Retry-After (secondes ou date HTTP)"""
+    if not value:
+        return 0
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class HostController:
+    """Contrôle AIMD du nombre de requêtes simultanées et du débit vers un hôte
+
+    - succès avec p95 sous la cible : +1/limite (environ +1 par aller-retour
+      complet), débit +rate_step/débit (environ +RATE_STEP fois la limite configurée par seconde)
+    - p95 au-dessus de la cible : limite et débit x0.9
+    - 429/503, délai dépassé, erreur de connexion : limite et débit x0.5 et pause Retry-After
+    Les réductions sont espacées d'au moins une latence médiane pour qu'une même
+    rafale d'erreurs ne soit comptée qu'une fois.
+
+    Le débit est celui du seau à jetons de l'hôte (fetch_engine.TokenBucket),
+    rattaché par attach : il part de la limite configurée et monte jusqu'à
+    `max_rate_factor` fois cette limite (1 : la limite configurée n'est jamais
+    dépassée, le débit ne fait que baisser puis remonter).
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY, target_p95=TARGET_P95,
+                 max_rate_factor=MAX_RATE_FACTOR):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_p95 = target_p95
+        self.max_rate_factor = max_rate_factor
+        self.bucket = None
+        self.max_rate = None
+        self.rate_step = None
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def attach(self, bucket):
+        """Ajuste désormais le débit de `bucket`, entre MIN_RATE et max_rate_factor fois son débit actuel"""
+        with self.condition:
+            if bucket is not self.bucket:
+                self.bucket = bucket
+                self.max_rate = bucket.rate * self.max_rate_factor
+                self.rate_step = bucket.rate * RATE_STEP
+
+    @property
+    def rate(self):
+        return self.bucket.rate if self.bucket else None
+
+    def acquire(self):
+        """Attend une place libre sous la limite courante"""
+        with self.condition:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(wait if wait > 0 else None)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+    def decrease(self, factor, now):
+        if now - self.last_decrease >= self.percentile(0.5):
+            self.limit = max(self.minimum, self.limit * factor)
+            if self.bucket:
+                self.bucket.set_rate(max(MIN_RATE, self.bucket.rate * factor))
+            self.last_decrease = now
+
+    def release(self, latency, status=None, retry_after=None):
+        """Libère la place et ajuste la limite d'après la réponse (status None = erreur réseau)"""
+        now = time.monotonic()
+        with self.condition:
+            self.in_flight -= 1
+            if status is None or status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.decrease(0.5, now)
+                delay = parse_retry_after(retry_after) or (THROTTLE_PAUSE if status else 0)
+                if delay:
+                    self.blocked_until = max(self.blocked_until, now + delay)
+            else:
+                self.latencies.append(latency)
+                if len(self.latencies) >= MIN_SAMPLES and self.percentile(0.95) > self.target_p95:
+                    self.decrease(0.9, now)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                    if self.bucket:
+                        self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.rate_step / self.bucket.rate))
+            self.condition.notify_all()
+
+    def cancel(self):
+        """Libère la place sans ajuster la limite (erreur sans rapport avec la charge)"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+class AdaptiveController:
+    """Un HostController par hôte contacté
+
+    Le débit des hôtes `protected` (fiches Parcoursup) ne dépasse jamais leur
+    limite configurée : seuls les autres sites montent jusqu'à `max_rate_factor`
+    fois la leur.
+    """
+
+    def __init__(self, protected=(), **options):
+        self.options = options
+        self.protected = set(protected)
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def controller_for(self, url):
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            controller = self.hosts.get(host)
+            if controller is None:
+                options = dict(self.options, max_rate_factor=1.0) if host in self.protected else self.options
+                controller = HostController(**options)
+                self.hosts[host] = controller
+            return controller
+
+    def slot(self, url, bucket=None):
+        """Place pour une requête vers l'hôte de l'URL ; `bucket` est le seau à jetons dont le contrôleur ajuste le débit"""
+        controller = self.controller_for(url)
+        if bucket is not None:
+            controller.attach(bucket)
+        return RequestSlot(controller)
+
+    def report(self):
+        """Limite atteinte, débit, p95 et nombre de ralentissements par hôte"""
+        lines = []
+        with self.lock:
+            hosts = sorted(self.hosts.items(), key=lambda item: -len(item[1].latencies))
+        for host, controller in hosts[:10]:
+            rate = controller.rate
+            lines.append(f"{host} : {controller.limit:.1f} requêtes simultanées, "
+                         f"{f'{rate:.1f} requêtes/s, ' if rate else ''}p95 {controller.percentile(0.95):.2f} s, {controller.throttled} ralentissements")
+        return '\n'.join(lines)
+
+
+class RequestSlot:
+    """Place occupée par une requête ; la réponse observée ajuste le contrôleur"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.response = None
+
+    def __enter__(self):
+        self.controller.acquire()
+        self.start = time.monotonic()
+        return self
+
+    def begin(self):
+        """Démarre la mesure de latence (après l'attente éventuelle de la limite de débit)"""
+        self.start = time.monotonic()
+
+    def observe(self, response):
+        self.response = response
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self.start
+        if self.response is None:
+            if exc_type is not None and issubclass(exc_type, (requests.ConnectionError, requests.Timeout)):
+                self.controller.release(latency)
+            else:
+                self.controller.cancel()
+        else:
+            self.controller.release(latency, self.response.status_code, self.response.headers.get('Retry-After'))
+        return False
@@ -0,0 +1,527 @@
+import contextlib
+import datetime
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import extraction
+import fetch_engine
+from http_session import configure_session
+from stub_server import start_stub_server
+
+
+def bench_fetch(rows=200, latency=0.05, max_workers=16):
+    """Compare le traitement séquentiel et le moteur concurrent sur un serveur local factice"""
+    import scraper_bulk
+
+    server, base_url = start_stub_server(latency=latency)
+    # Le serveur local tolère un débit élevé ; on lève la limite pour mesurer le moteur lui-même
+    fetch_engine.rate_limiter.configure('127.0.0.1', rate=1000, burst=max_workers)
+    fetch_engine.rate_limiter.configure('localhost', rate=1000, burst=max_workers)
+    configure_session(pool_maxsize=max_workers)
+
+    urls = [f'{base_url}/fiche?g_ta_cod={n}' for n in range(rows)]
+    try:
+        start = time.perf_counter()
+        sequential = [scraper_bulk.extract_contacts_from_url(url) for url in urls]
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = list(fetch_engine.map_ordered(scraper_bulk.extract_contacts_from_url, urls, max_workers))
+        concurrent_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print(f"=== BENCHMARK FETCH ({rows} lignes, latence {latency * 1000:.0f} ms) ===")
+    print(f"Séquentiel : {sequential_time:.2f} s ({rows / sequential_time:.1f} lignes/s)")
+    print(f"Concurrent ({max_workers} workers) : {concurrent_time:.2f} s ({rows / concurrent_time:.1f} lignes/s)")
+    print(f"Accélération : x{sequential_time / concurrent_time:.1f}")
+    print(f"Résultats identiques et ordonnés : {sequential == concurrent}")
+
+
+def make_synthetic_sheet(path, rows, url_column='O', columns=15):
+    """Génère un classeur de `rows` lignes proche du fichier de cartographie"""
+    import openpyxl
+    from openpyxl.utils import column_index_from_string
+
+    url_idx = column_index_from_string(url_column) - 1
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = wb.create_sheet()
+    sheet.append([f'Colonne {i + 1}' for i in range(columns)])
+    for n in range(rows):
+        values = [f'valeur {n}-{i}' for i in range(columns)]
+        values[url_idx] = f'https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod={n}'
+        sheet.append(values)
+    wb.save(path)
+
+
+def fake_output_row(row_num, url):
+    return [row_num, url, 'Non trouvé', 'Non trouvé', 'Non trouvé', 'Traité', datetime.datetime.now()]
+
+
+def legacy_excel_pipeline(input_file, output_file, url_column='O', start_row=2):
+    """Ancienne approche : classeur complet en mémoire, accès cellule par cellule"""
+    import openpyxl
+
+    wb_input = openpyxl.load_workbook(input_file)
+    sheet_input = wb_input.active
+    wb_output = openpyxl.Workbook()
+    sheet_output = wb_output.active
+    for row_num in range(start_row, sheet_input.max_row + 1):
+        url = sheet_input[f'{url_column}{row_num}'].value
+        sheet_output.append(fake_output_row(row_num, url))
+    # Une seule sauvegarde ici ; l'ancien code la répétait toutes les 100 lignes
+    start = time.perf_counter()
+    wb_output.save(output_file)
+    return time.perf_counter() - start
+
+
+def streaming_excel_pipeline(input_file, output_file, url_column='O', start_row=2):
+    """Nouvelle approche : lecture read_only, journal, export write_only (ou CSV)"""
+    from checkpoint import RunJournal
+    from scraper_bulk import iter_url_column
+
+    _, rows = iter_url_column(input_file, url_column, start_row)
+    journal = RunJournal(output_file + '.journal.jsonl')
+    for row_num, url in rows:
+        journal.append(fake_output_row(row_num, url))
+    journal.close()
+    start = time.perf_counter()
+    if output_file.endswith('.csv'):
+        journal.export_csv(output_file)
+    else:
+        journal.export_excel(output_file)
+    return time.perf_counter() - start
+
+
+def _measure(func, args, queue):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, result, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def measure_in_subprocess(func, *args):
+    """Exécute func dans un processus séparé et renvoie (durée totale, résultat de func, pic mémoire en Mo)"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(func, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def bench_excel(rows=100_000):
+    """Compare la mémoire et le temps du pipeline Excel complet et du pipeline en flux"""
+    print(f"=== BENCHMARK EXCEL (jusqu'à {rows} lignes synthétiques) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (rows // 10, rows):
+            input_file = os.path.join(tmp, f'synthetique_{size}.xlsx')
+            make_synthetic_sheet(input_file, size)
+            pipelines = (
+                ('complet', legacy_excel_pipeline, 'xlsx'),
+                ('flux', streaming_excel_pipeline, 'xlsx'),
+                ('flux csv', streaming_excel_pipeline, 'csv'),
+            )
+            for name, pipeline, extension in pipelines:
+                output_file = os.path.join(tmp, f'sortie_{size}_{len(name)}.{extension}')
+                elapsed, save_time, peak_mb = measure_in_subprocess(pipeline, input_file, output_file)
+                print(f"{size:>7} lignes - {name:<8} : {elapsed:6.1f} s (écriture {save_time:5.1f} s), "
+                      f"pic mémoire {peak_mb:7.1f} Mo")
+                if pipeline is legacy_excel_pipeline:
+                    # Sauvegardes toutes les 100 lignes d'un classeur qui grossit : coût quadratique
+                    print(f"{'':>16}  + sauvegardes automatiques estimées : {size / 100 * save_time / 2:6.1f} s")
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+
+def load_fixture_pages(directory=FIXTURES_DIR):
+    """Renvoie {nom: html} pour les pages enregistrées dans le dossier de fixtures"""
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                pages[name] = f.read()
+    return pages
+
+
+def legacy_extract_contacts(soup):
+    """Ancienne extraction (5 niveaux de parents, regex non compilée), conservée pour comparaison"""
+    import re
+
+    def extract_emails_from_text(text):
+        return re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
+
+    contact_section = soup.find('h3', string=lambda text: text and 'Contacter et échanger' in text)
+    if not contact_section:
+        contact_section = soup.find(string=lambda text: text and 'Contacter et échanger' in text)
+
+    pedagogical_email = 'Non trouvé'
+    admin_email = 'Non trouvé'
+    general_contact = 'Non trouvé'
+
+    if contact_section:
+        parent_section = contact_section.find_parent()
+        for _ in range(5):
+            if not parent_section:
+                break
+            section_text = parent_section.get_text()
+            emails = extract_emails_from_text(section_text)
+            if emails:
+                for email in emails:
+                    email_context = section_text.lower()
+                    if 'pédagogique' in email_context or 'pedagogique' in email_context:
+                        pedagogical_email = email
+                    elif 'administratif' in email_context or 'administration' in email_context:
+                        admin_email = email
+                    elif general_contact == 'Non trouvé':
+                        general_contact = email
+                if len(emails) >= 2:
+                    if pedagogical_email == 'Non trouvé':
+                        pedagogical_email = emails[0]
+                    if admin_email == 'Non trouvé':
+                        admin_email = emails[1]
+                elif pedagogical_email == 'Non trouvé':
+                    pedagogical_email = emails[0]
+                break
+            parent_section = parent_section.find_parent()
+
+    return general_contact, pedagogical_email, admin_email
+
+
+def bench_extraction(iterations=500):
+    """Micro-benchmark de l'extraction des contacts sur les pages de fixtures (parsing exclu)"""
+    from bs4 import BeautifulSoup
+    from extraction import extract_contacts_from_soup
+
+    print(f"=== BENCHMARK EXTRACTION ({iterations} itérations par page) ===")
+    for name, html in load_fixture_pages().items():
+        soup = BeautifulSoup(html, 'html.parser')
+        timings = {}
+        results = {}
+        for label, extract in (('ancienne', legacy_extract_contacts), ('nouvelle', extract_contacts_from_soup)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                results[label] = extract(soup)
+            timings[label] = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{name} : {timings['ancienne']:7.1f} µs -> {timings['nouvelle']:7.1f} µs "
+              f"(x{timings['ancienne'] / timings['nouvelle']:.1f})")
+        if results['ancienne'] != results['nouvelle']:
+            print(f"    ancienne : {results['ancienne']}")
+            print(f"    nouvelle : {results['nouvelle']}")
+
+
+def enlarge_page(html, filler_paragraphs=400):
+    """Grossit une page de fixture jusqu'à la taille d'une vraie fiche (~150 Ko) avant la section contact"""
+    filler = ''.join(
+        f'<div class="bloc"><h2>Rubrique {n}</h2><p>Texte de présentation de la formation, '
+        f'attendus nationaux et locaux, modalités d\'examen des vœux - paragraphe {n}.</p></div>\n'
+        for n in range(filler_paragraphs)
+    )
+    position = html.find('<main>')
+    position = position + len('<main>') if position != -1 else 0
+    return html[:position] + filler + html[position:] + filler
+
+
+def bench_parsing(iterations=20):
+    """Temps de parsing par backend : page complète, fragment de la section contact, liens seuls"""
+    from extraction import extract_contacts_from_soup
+    from html_parser import available_backends, parse_html, parse_contact_section, parse_links
+
+    pages = {name: enlarge_page(html) for name, html in load_fixture_pages().items()}
+    print(f"=== BENCHMARK PARSING ({iterations} itérations, pages agrandies à ~"
+          f"{sum(map(len, pages.values())) // len(pages) // 1024} Ko) ===")
+    for backend in available_backends():
+        timings = {'complet': 0.0, 'fragment': 0.0, 'liens': 0.0}
+        mismatches = []
+        for name, html in pages.items():
+            for label, parse in (('complet', parse_html), ('fragment', parse_contact_section), ('liens', parse_links)):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    soup = parse(html, backend=backend)
+                timings[label] += (time.perf_counter() - start) / iterations * 1000
+            if extract_contacts_from_soup(parse_html(html, backend=backend)) != extract_contacts_from_soup(parse_contact_section(html, backend=backend)):
+                mismatches.append(name)
+        per_page = {label: total / len(pages) for label, total in timings.items()}
+        print(f"{backend:<12} : complet {per_page['complet']:6.2f} ms, fragment contact {per_page['fragment']:6.2f} ms, "
+              f"liens seuls {per_page['liens']:6.2f} ms par page")
+        if mismatches:
+            print(f"    résultats différents entre page complète et fragment : {', '.join(mismatches)}")
+
+
+def bench_pipeline(rows=200, fetch_workers=8):
+    """Débit du pipeline en étages selon le nombre de processus d'analyse, sur les fixtures agrandies"""
+    from scraper_bulk import process_row
+    from pipeline import run_pipeline
+    from stub_server import start_stub_server_process
+
+    pages = [enlarge_page(html) for html in load_fixture_pages().values()]
+    process, base_url = start_stub_server_process(latency=0.02, pages=pages)
+    for host in ('127.0.0.1', 'localhost'):
+        fetch_engine.rate_limiter.configure(host, rate=10000, burst=fetch_workers)
+    configure_session(pool_maxsize=fetch_workers)
+
+    # Le serveur local est accepté comme hôte de fiches le temps du benchmark
+    extraction.FICHE_DOMAINS.add('127.0.0.1')
+    input_rows = [(n + 2, f'{base_url}/fiche?g_ta_cod={n}') for n in range(rows)]
+    cores = os.cpu_count() or 1
+    print(f"=== BENCHMARK PIPELINE ({rows} fiches, {cores} coeur(s) disponibles) ===")
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reference = [row[:5] for row in fetch_engine.map_ordered(process_row, input_rows, fetch_workers)]
+        elapsed = time.perf_counter() - start
+        print(f"Threads seuls          : {rows / elapsed:6.1f} lignes/s")
+
+        for parse_workers in sorted({1, 2, cores, cores * 2}):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                output = [row[:5] for row in run_pipeline(input_rows, fetch_workers, parse_workers)]
+            elapsed = time.perf_counter() - start
+            print(f"{parse_workers:>2} processus d'analyse : {rows / elapsed:6.1f} lignes/s"
+                  f"{'' if output == reference else '  (RÉSULTATS DIFFÉRENTS)'}")
+    finally:
+        extraction.FICHE_DOMAINS.discard('127.0.0.1')
+        process.terminate()
+
+
+def bench_adaptive(rows=300, latency=0.05, max_workers=32, capacity=8):
+    """Concurrence fixe élevée contre contrôleur adaptatif, sur un serveur qui répond 429 au-delà de `capacity`"""
+    from adaptive import AdaptiveController
+    import scraper_bulk
+
+    for host in ('127.0.0.1', 'localhost'):
+        fetch_engine.rate_limiter.configure(host, rate=10000, burst=max_workers)
+    configure_session(pool_maxsize=max_workers)
+    controller = fetch_engine.concurrency_controller
+
+    print(f"=== BENCHMARK ADAPTATIF ({rows} fiches, {max_workers} workers, serveur limité à {capacity} requêtes) ===")
+    try:
+        for label, candidate in (('Concurrence fixe', None), ('Contrôleur AIMD', AdaptiveController())):
+            fetch_engine.concurrency_controller = candidate
+            server, base_url = start_stub_server(latency=latency, max_concurrent=capacity)
+            urls = [f'{base_url}/fiche?g_ta_cod={n}' for n in range(rows)]
+            try:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = list(fetch_engine.map_ordered(scraper_bulk.extract_contacts_from_url, urls, max_workers))
+                elapsed = time.perf_counter() - start
+            finally:
+                server.shutdown()
+            errors = sum(1 for contacts in results if 'Erreur' in contacts)
+            print(f"{label:<17} : {rows / elapsed:6.1f} lignes/s, {server.rejected} réponses 429, {errors} lignes en erreur")
+            if candidate is not None:
+                print(candidate.report())
+    finally:
+        fetch_engine.concurrency_controller = controller
+
+
+def bench_adaptive_rate(rows=400, latency=0.05, max_workers=32, capacity=8, rate=20.0):
+    """Limite de débit fixe contre débit ajusté par le contrôleur, partant de `rate` requêtes/s"""
+    from adaptive import AdaptiveController
+    import scraper_bulk
+
+    configure_session(pool_maxsize=max_workers)
+    controller = fetch_engine.concurrency_controller
+
+    print(f"=== BENCHMARK DÉBIT ADAPTATIF ({rows} fiches, limite configurée {rate:g} requêtes/s, serveur limité à {capacity} requêtes) ===")
+    try:
+        for label, candidate in (('Débit fixe', None), ('Contrôleur AIMD', AdaptiveController())):
+            for host in ('127.0.0.1', 'localhost'):
+                fetch_engine.rate_limiter.configure(host, rate=rate, burst=2)
+            fetch_engine.concurrency_controller = candidate
+            server, base_url = start_stub_server(latency=latency, max_concurrent=capacity)
+            urls = [f'{base_url}/fiche?g_ta_cod={n}' for n in range(rows)]
+            try:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = list(fetch_engine.map_ordered(scraper_bulk.extract_contacts_from_url, urls, max_workers))
+                elapsed = time.perf_counter() - start
+            finally:
+                server.shutdown()
+            errors = sum(1 for contacts in results if 'Erreur' in contacts)
+            print(f"{label:<17} : {rows / elapsed:6.1f} lignes/s, {server.rejected} réponses 429, {errors} lignes en erreur")
+            if candidate is not None:
+                print(candidate.report())
+    finally:
+        fetch_engine.concurrency_controller = controller
+
+
+def replay_bulk_run(workdir, input_file, base_url, parse_workers, golden):
+    """Traitement complet rejoué sur le corpus ; renvoie (temps CPU, pages téléchargées, lignes différentes du golden)"""
+    import json
+    import replay
+    import scraper_bulk
+
+    os.chdir(workdir)
+    replay.enable_replay(base_url)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper_bulk.process_excel_bulk(input_file, 'A', 2, 16, cache_file=None, parse_workers=parse_workers, deduplicate=False)
+    cpu = sum(getattr(resource.getrusage(who), field)
+              for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN) for field in ('ru_utime', 'ru_stime'))
+    stem = os.path.splitext(input_file)[0]
+    with open(f'{stem}.metrics.jsonl', encoding='utf-8') as f:
+        pages = sum(json.loads(line)['requests'] for line in f)
+    with open(f'{stem}.journal.jsonl', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    mismatches = sum(1 for r in records if [r['general'], r['pedagogical'], r['admin']] != golden[r['url']])
+    return cpu, pages, mismatches
+
+
+def bench_replay(rows=400, latency=0.03, error_rate=0.0):
+    """Débit, CPU par page et pic mémoire du traitement complet rejoué sur le corpus enregistré (fixtures/corpus)"""
+    import json
+    import openpyxl
+    from replay import Corpus, GOLDEN_FILE
+    from stub_server import start_corpus_server, start_stub_server_process
+
+    corpus = Corpus()
+    with open(os.path.join(corpus.directory, GOLDEN_FILE), encoding='utf-8') as f:
+        golden = json.load(f)
+    urls = corpus.fiche_urls()
+    process, base_url = start_stub_server_process(start=start_corpus_server, corpus=corpus,
+                                                  latency=latency, error_rate=error_rate)
+    print(f"=== BENCHMARK REJEU ({rows} lignes sur {len(urls)} fiches enregistrées, latence {latency * 1000:.0f} ms, "
+          f"{error_rate:.0%} d'erreurs injectées) ===")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for parse_workers in (0, 2):
+                input_file = os.path.join(tmp, f'rejeu_{parse_workers}.xlsx')
+                wb = openpyxl.Workbook(write_only=True)
+                sheet = wb.create_sheet()
+                sheet.append(['URL'])
+                for n in range(rows):
+                    sheet.append([urls[n % len(urls)]])
+                wb.save(input_file)
+
+                elapsed, (cpu, pages, mismatches), peak_mb = measure_in_subprocess(
+                    replay_bulk_run, tmp, input_file, base_url, parse_workers, golden)
+                label = f"{parse_workers} processus d'analyse" if parse_workers else 'threads seuls'
+                print(f"{label:<22} : {rows / elapsed:6.1f} lignes/s, {cpu / max(pages, 1) * 1000:5.1f} ms CPU par page "
+                      f"({pages} pages), pic mémoire du processus principal {peak_mb:6.1f} Mo, {mismatches} lignes différentes du golden")
+    finally:
+        process.terminate()
+
+
+def replay_shard_worker(base_url, queue_dir, worker):
+    """Processus de travail d'un traitement réparti, redirigé vers le serveur de rejeu"""
+    import replay
+    import shards
+
+    replay.enable_replay(base_url)
+    shards.work(queue_dir, worker)
+
+
+def bench_shards(rows=600, latency=0.03, shard_count=4):
+    """Débit du traitement réparti selon le nombre de processus locaux, rejoué sur le corpus et contrôlé contre golden.json
+
+    Répartition par plages : le corpus ne compte que quelques fiches, trop peu pour équilibrer des shards par hash.
+    """
+    import functools
+    import json
+    import openpyxl
+    import shards
+    from replay import Corpus, GOLDEN_FILE
+    from stub_server import start_corpus_server, start_stub_server_process
+
+    corpus = Corpus()
+    with open(os.path.join(corpus.directory, GOLDEN_FILE), encoding='utf-8') as f:
+        golden = json.load(f)
+    urls = corpus.fiche_urls()
+    process, base_url = start_stub_server_process(start=start_corpus_server, corpus=corpus, latency=latency)
+    print(f"=== BENCHMARK TRAITEMENT RÉPARTI ({rows} lignes, {shard_count} shards, latence {latency * 1000:.0f} ms) ===")
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            input_file = os.path.join(tmp, 'rejeu.xlsx')
+            wb = openpyxl.Workbook(write_only=True)
+            sheet = wb.create_sheet()
+            sheet.append(['URL'])
+            for n in range(rows):
+                sheet.append([urls[n % len(urls)]])
+            wb.save(input_file)
+
+            for workers in (1, 2, shard_count):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    output_file = shards.run_local(input_file, 'A', 2, shard_count, workers, shards.RANGE, cache_file=None,
+                                                   deduplicate=False, output_format='csv',
+                                                   worker=functools.partial(replay_shard_worker, base_url))
+                elapsed = time.perf_counter() - start
+                with open(output_file, encoding='utf-8-sig') as f:
+                    lines = [line.rstrip('\n').split(';') for line in f][1:]
+                mismatches = sum(1 for values in lines if values[2:5] != golden[values[1]])
+                ordered = [int(values[0]) for values in lines] == list(range(2, rows + 2))
+                print(f"{workers} processus : {rows / elapsed:6.1f} lignes/s, {len(lines)} lignes fusionnées "
+                      f"({'ordonnées' if ordered else 'DÉSORDONNÉES'}), {mismatches} lignes différentes du golden")
+    finally:
+        os.chdir(cwd)
+        process.terminate()
+
+
+def legacy_status_counts(path):
+    """Ancienne vérification : classeur complet chargé pour compter les statuts"""
+    import openpyxl
+
+    sheet = openpyxl.load_workbook(path).active
+    counts = {}
+    for row in range(2, sheet.max_row + 1):
+        status = str(sheet.cell(row, 6).value)
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def store_status_counts(path):
+    from result_store import ResultStore
+
+    return ResultStore.load(path).status_counts()
+
+
+def bench_results(rows=100_000):
+    """Comptage des statuts : classeur de résultats chargé par openpyxl ou base de résultats compacte"""
+    from checkpoint import processed_row, row_to_record, skipped_row
+    from result_store import ResultStore
+
+    print(f"=== BENCHMARK BASE DE RÉSULTATS ({rows} lignes) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        records = []
+        for n in range(rows):
+            if n % 20 == 0:
+                records.append(row_to_record(skipped_row(n + 2, '')))
+            else:
+                domain = f'etablissement{n % 3000}.fr'
+                contacts = ('Non trouvé', f'scolarite@{domain}', f'contact@{domain}' if n % 3 else 'Non trouvé')
+                records.append(row_to_record(processed_row(n + 2, f'https://dossierappel.parcoursup.fr/?g_ta_cod={n % 15000}', contacts)))
+        store = ResultStore.from_records(records)
+        store_file = store.save(os.path.join(tmp, 'resultats.results'))
+        excel_file = store.export(os.path.join(tmp, 'resultats.xlsx'))
+        print(f"Taille : Excel {os.path.getsize(excel_file) / 1e6:.1f} Mo, base {os.path.getsize(store_file) / 1e6:.1f} Mo")
+        for label, func, path in (('openpyxl (classeur complet)', legacy_status_counts, excel_file),
+                                  ('base de résultats', store_status_counts, store_file)):
+            elapsed, _, peak_mb = measure_in_subprocess(func, path)
+            print(f"{label:<28} : {elapsed:6.2f}s, pic mémoire {peak_mb:6.1f} Mo")
+
+
+BENCHMARKS = {
+    'fetch': bench_fetch,
+    'excel': bench_excel,
+    'extraction': bench_extraction,
+    'parsing': bench_parsing,
+    'pipeline': bench_pipeline,
+    'adaptive': bench_adaptive,
+    'adaptive_rate': bench_adaptive_rate,
+    'replay': bench_replay,
+    'shards': bench_shards,
+    'results': bench_results,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
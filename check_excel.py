@@ -1,60 +1,67 @@
+import sys
+
 import openpyxl
+from openpyxl.utils import get_column_letter
+
+def check_excel_structure(filename, sample_rows=5, max_columns=10, scan_rows=10):
+    """Examine la structure du fichier Excel pour trouver les URLs
 
-def check_excel_structure(filename):
-    """Examine la structure du fichier Excel pour trouver les URLs"""
+    Le classeur est lu en flux (read_only) et seules les `scan_rows` premières
+    lignes sont parcourues : l'analyse est immédiate même sur un très gros fichier.
+    """
+    try:
+        wb = openpyxl.load_workbook(filename, read_only=True)
+    except Exception as e:
+        print(f"Erreur: {e}")
+        return
     try:
-        wb = openpyxl.load_workbook(filename)
         sheet = wb.active
-        
+        rows = list(sheet.iter_rows(min_row=1, max_row=max(scan_rows, sample_rows + 1), values_only=True))
+        width = max((len(row) for row in rows), default=0)
+
         print(f"=== ANALYSE DU FICHIER {filename} ===")
-        print(f"Nombre de lignes: {sheet.max_row}")
-        print(f"Nombre de colonnes: {sheet.max_column}")
+        # Dimensions déclarées par le classeur (absentes de certains fichiers générés)
+        print(f"Nombre de lignes: {sheet.max_row or 'inconnu'}")
+        print(f"Nombre de colonnes: {sheet.max_column or width}")
         print()
-        
+
         # Afficher les en-têtes (première ligne)
         print("=== EN-TÊTES (Ligne 1) ===")
-        for col in range(1, min(sheet.max_column + 1, 11)):  # Max 10 colonnes
-            cell = sheet.cell(1, col)
-            col_letter = openpyxl.utils.get_column_letter(col)
-            print(f"Colonne {col_letter}: '{cell.value}'")
+        header = rows[0] if rows else ()
+        for col, value in enumerate(header[:max_columns], start=1):
+            print(f"Colonne {get_column_letter(col)}: '{value}'")
         print()
-        
+
         # Examiner quelques lignes de données
-        print("=== ÉCHANTILLON DE DONNÉES (Lignes 2-6) ===")
-        for row in range(2, min(7, sheet.max_row + 1)):
-            print(f"\n--- Ligne {row} ---")
-            for col in range(1, min(sheet.max_column + 1, 11)):
-                cell = sheet.cell(row, col)
-                col_letter = openpyxl.utils.get_column_letter(col)
-                value = str(cell.value)[:50] if cell.value else "VIDE"
-                print(f"{col_letter}: {value}")
-        
+        print(f"=== ÉCHANTILLON DE DONNÉES (Lignes 2-{sample_rows + 1}) ===")
+        for row_num, row in enumerate(rows[1:sample_rows + 1], start=2):
+            print(f"\n--- Ligne {row_num} ---")
+            for col, value in enumerate(row[:max_columns], start=1):
+                value = str(value)[:50] if value else "VIDE"
+                print(f"{get_column_letter(col)}: {value}")
+
         # Chercher les colonnes contenant des URLs Parcoursup
         print("\n=== RECHERCHE D'URLS PARCOURSUP ===")
         parcoursup_columns = []
-        
-        for col in range(1, sheet.max_column + 1):
-            col_letter = openpyxl.utils.get_column_letter(col)
-            # Vérifier les premières lignes de cette colonne
-            found_parcoursup = False
-            for row in range(2, min(10, sheet.max_row + 1)):
-                cell = sheet.cell(row, col)
-                if cell.value and 'parcoursup.fr' in str(cell.value):
-                    found_parcoursup = True
-                    break
-            
-            if found_parcoursup:
+
+        for col in range(width):
+            if any(col < len(row) and row[col] and 'parcoursup.fr' in str(row[col]) for row in rows[1:]):
+                col_letter = get_column_letter(col + 1)
                 parcoursup_columns.append(col_letter)
                 print(f"✅ Colonne {col_letter} contient des URLs Parcoursup")
-        
+
         if not parcoursup_columns:
-            print("❌ Aucune URL Parcoursup trouvée dans les 10 premières lignes")
+            print(f"❌ Aucune URL Parcoursup trouvée dans les {scan_rows} premières lignes")
             print("Vérifiez manuellement votre fichier ou ajustez la recherche")
         else:
             print(f"\n🎯 Colonnes recommandées pour le script: {', '.join(parcoursup_columns)}")
-            
+
     except Exception as e:
         print(f"Erreur: {e}")
+    finally:
+        wb.close()
 
 if __name__ == '__main__':
-    check_excel_structure('20250117_cartographie_for.xlsx') 
\ No newline at end of file
+    # Fichier et options du profil de configuration (voir cli.py)
+    import cli
+    cli.main(['inspect'] + sys.argv[1:])
@@ -1,71 +1,72 @@
-import openpyxl
 import glob
+import sys
 
-def check_extraction_results():
+from result_store import ResultStore, latest_results_file
+
+def load_results(path=None):
+    """Charge la base de résultats `path`, ou la plus récente ; à défaut, le fichier de sortie le plus récent"""
+    if path is None:
+        path = latest_results_file()
+    if path is None:
+        # Traitement antérieur à la base de résultats : relecture en flux du fichier de sortie
+        result_files = glob.glob("contacts_extraits_*.xlsx") + glob.glob("contacts_extraits_*.csv")
+        if not result_files:
+            return None, None
+        path = max(result_files)
+    if path.endswith('.results'):
+        return path, ResultStore.load(path)
+    from incremental import read_output_file
+    return path, ResultStore.from_records(read_output_file(path))
+
+def check_extraction_results(path=None):
     """Vérifie les résultats du scraping d'e-mails"""
-    
-    # Trouver le fichier de résultats le plus récent
-    result_files = glob.glob("contacts_extraits_*.xlsx")
-    if not result_files:
-        print("❌ Aucun fichier de résultats trouvé")
-        return
-    
-    latest_file = max(result_files)
-    print(f"📁 Examen du fichier : {latest_file}")
-    
+
     try:
-        wb = openpyxl.load_workbook(latest_file)
-        sheet = wb.active
-        
-        print(f"📊 Nombre de lignes dans le fichier : {sheet.max_row}")
+        latest_file, results = load_results(path)
+        if results is None:
+            print("❌ Aucun fichier de résultats trouvé")
+            return
+
+        print(f"📁 Examen du fichier : {latest_file}")
+        print(f"📊 Nombre de lignes dans le fichier : {len(results)}")
         print()
-        
-        # Analyser les résultats
-        total_rows = sheet.max_row - 1  # Exclure l'en-tête
-        emails_found = 0
-        errors = 0
-        skipped = 0
-        
+
         print("=== ÉCHANTILLON DES RÉSULTATS ===")
-        for row in range(2, min(12, sheet.max_row + 1)):  # Afficher les 10 premières lignes
-            ligne = sheet.cell(row, 1).value
-            url = sheet.cell(row, 2).value
-            contact_general = sheet.cell(row, 3).value
-            mail_pedago = sheet.cell(row, 4).value
-            mail_admin = sheet.cell(row, 5).value
-            statut = sheet.cell(row, 6).value
-            
-            print(f"\n--- Ligne {ligne} ---")
-            print(f"URL : {str(url)[:60]}...")
-            print(f"Contact général : {contact_general}")
-            print(f"Mail pédagogique : {mail_pedago}")
-            print(f"Mail administratif : {mail_admin}")
-            print(f"Statut : {statut}")
-            
-            # Compter les statistiques
-            if statut == 'Traité':
-                if mail_pedago != 'Non trouvé' or mail_admin != 'Non trouvé':
-                    emails_found += 1
-            elif 'Erreur' in str(statut):
-                errors += 1
-            elif statut == 'Skipped':
-                skipped += 1
-        
+        for i in range(min(10, len(results))):  # Afficher les 10 premières lignes
+            result = results.record(i)
+            print(f"\n--- Ligne {result.row} ---")
+            print(f"URL : {result.url[:60]}...")
+            print(f"Contact général : {result.general}")
+            print(f"Mail pédagogique : {result.pedagogical}")
+            print(f"Mail administratif : {result.admin}")
+            print(f"Statut : {result.status}")
+
+        # Statistiques : agrégats sur les colonnes de la base
+        total_rows = len(results)
+        statuses = results.status_counts()
+        emails_found = results.rows_with_emails()
+        found = results.found_counts()
+
         print(f"\n=== STATISTIQUES GLOBALES ===")
         print(f"📈 Total de lignes traitées : {total_rows}")
         print(f"✅ Lignes avec e-mails trouvés : {emails_found}")
-        print(f"❌ Lignes avec erreurs : {errors}")
-        print(f"⏭️ Lignes ignorées : {skipped}")
+        print(f"❌ Lignes avec erreurs : {statuses['Erreur']}")
+        print(f"⏭️ Lignes ignorées : {statuses['Skipped']}")
         print(f"📧 Taux de succès e-mails : {(emails_found/total_rows*100):.1f}%" if total_rows > 0 else "N/A")
-        
+        print(f"   Contact général : {found['general']}, pédagogique : {found['pedagogical']}, administratif : {found['admin']}")
+        domains = results.top_domains(5)
+        if domains:
+            print(f"🌐 Domaines les plus fréquents : {', '.join(f'{domain} ({count})' for domain, count in domains)}")
+
         # Vérifier s'il y a des e-mails valides
         if emails_found > 0:
             print(f"\n🎉 SUCCÈS ! Le script extrait bien les e-mails !")
         else:
             print(f"\n⚠️ Aucun e-mail trouvé pour l'instant. Le script continue...")
-            
+
     except Exception as e:
         print(f"Erreur lors de la lecture : {e}")
 
 if __name__ == '__main__':
-    check_extraction_results() 
\ No newline at end of file
+    import cli
+    cli.main(['report'] + sys.argv[1:])
@@ -0,0 +1,160 @@
+import csv
+import datetime
+import json
+import os
+
+import openpyxl
+
+OUTPUT_HEADERS = ['Ligne', 'URL', 'Contact Général', 'Mail Pédagogique', 'Mail Administratif', 'Statut', 'Timestamp']
+
+
+def default_journal_file(input_file):
+    """Chemin du journal associé à un fichier d'entrée"""
+    return f"{os.path.splitext(input_file)[0]}.journal.jsonl"
+
+
+def skipped_row(row_num, url):
+    """Ligne de sortie d'une URL absente ou non Parcoursup"""
+    return [row_num, url, 'URL invalide', 'URL invalide', 'URL invalide', 'Skipped', datetime.datetime.now()]
+
+
+def processed_row(row_num, url, contacts):
+    """Ligne de sortie d'une URL traitée"""
+    general, pedagogical, admin = contacts
+    return [row_num, url, general, pedagogical, admin, 'Traité', datetime.datetime.now()]
+
+
+def failed_row(row_num, url, error):
+    """Ligne de sortie d'une ligne dont le traitement a levé une exception"""
+    return [row_num, url, 'Erreur', 'Erreur', 'Erreur', f'Erreur: {error}', datetime.datetime.now()]
+
+
+def row_to_record(output_row):
+    """Convertit une ligne de sortie en enregistrement JSON"""
+    row_num, url, general, pedagogical, admin, status, timestamp = output_row
+    return {
+        'row': row_num,
+        'url': str(url),
+        'general': general,
+        'pedagogical': pedagogical,
+        'admin': admin,
+        'status': status,
+        'timestamp': timestamp.isoformat(),
+    }
+
+
+def record_to_row(record):
+    """Convertit un enregistrement JSON en ligne de sortie"""
+    return [
+        record['row'],
+        record['url'],
+        record['general'],
+        record['pedagogical'],
+        record['admin'],
+        record['status'],
+        datetime.datetime.fromisoformat(record['timestamp']),
+    ]
+
+
+def is_finished(record):
+    """Une ligne est terminée si elle a été traitée ou ignorée sans erreur"""
+    if 'Erreur' in record['status']:
+        return False
+    return 'Erreur' not in (record['general'], record['pedagogical'], record['admin'])
+
+
+def journal_index(path):
+    """Position dans le fichier journal du dernier enregistrement de chaque ligne"""
+    offsets = {}
+    if not os.path.exists(path):
+        return offsets
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Dernière ligne tronquée par un arrêt brutal
+                record = None
+            if record is not None:
+                offsets[record['row']] = offset
+            offset += len(line)
+    return offsets
+
+
+def iter_journal_records(path):
+    """Enregistrements d'un fichier journal dans l'ordre des lignes ; le dernier l'emporte"""
+    offsets = journal_index(path)
+    with open(path, 'rb') as f:
+        for row_num in sorted(offsets):
+            f.seek(offsets[row_num])
+            yield json.loads(f.readline())
+
+
+def write_excel(records, output_file):
+    """Écrit un fichier Excel de résultats à partir d'enregistrements, en flux (write_only)"""
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = wb.create_sheet()
+    sheet.append(OUTPUT_HEADERS)
+    for record in records:
+        sheet.append(record_to_row(record))
+    wb.save(output_file)
+
+
+def write_csv(records, output_file):
+    """Écrit un fichier CSV de résultats (séparateur ';', UTF-8 avec BOM pour Excel)"""
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(OUTPUT_HEADERS)
+        for record in records:
+            writer.writerow(record_to_row(record))
+
+
+class RunJournal:
+    """Journal append-only (JSONL) des lignes traitées, écrit ligne par ligne
+
+    Seuls les numéros de lignes terminées sont gardés en mémoire ; les
+    enregistrements eux-mêmes sont relus depuis le fichier à l'export.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.finished = set()
+        if resume:
+            for record in self.iter_records():
+                if is_finished(record):
+                    self.finished.add(record['row'])
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def index(self):
+        """Position dans le fichier du dernier enregistrement de chaque ligne"""
+        return journal_index(self.path)
+
+    def iter_records(self):
+        """Enregistrements du journal dans l'ordre des lignes ; le dernier l'emporte"""
+        return iter_journal_records(self.path)
+
+    def is_finished(self, row_num):
+        return row_num in self.finished
+
+    def append(self, output_row):
+        """Enregistre durablement une ligne de sortie"""
+        record = row_to_record(output_row)
+        if is_finished(record):
+            self.finished.add(record['row'])
+        else:
+            self.finished.discard(record['row'])
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def export_excel(self, output_file):
+        """Écrit le fichier Excel de résultats à partir du journal, en flux (write_only)"""
+        write_excel(self.iter_records(), output_file)
+
+    def export_csv(self, output_file):
+        """Écrit les résultats au format CSV (plus rapide pour les très gros traitements)"""
+        write_csv(self.iter_records(), output_file)
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,214 @@
+import argparse
+import configparser
+import functools
+import os
+import sys
+
+# Seuls argparse, configparser et os sont chargés au démarrage : requests, BeautifulSoup
+# et openpyxl ne sont importés que par la sous-commande qui en a besoin
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profils.ini')
+
+# Valeurs utilisées quand ni le fichier de configuration ni la ligne de commande ne les fixent
+PROFILE_DEFAULTS = {
+    'input_file': '20250117_cartographie_for.xlsx',
+    'url_column': 'O',
+    'start_row': 2,
+    'max_workers': 8,
+    'parse_workers': 0,
+    'deduplicate': True,
+    'adaptive': True,
+    'max_rate_factor': 4.0,
+    'output_format': 'xlsx',
+    'shards': 0,
+    'cache': True,
+    'cache_dir': '.',
+    'parcoursup_rate': '2.0/2',
+    'site_rate': '1.0/2',
+    'parser': 'auto',
+}
+
+INT_SETTINGS = ('start_row', 'max_workers', 'parse_workers', 'shards')
+BOOL_SETTINGS = ('deduplicate', 'adaptive', 'cache')
+FLOAT_SETTINGS = ('max_rate_factor',)
+
+
+def parse_rate(value):
+    """'2.0/2' -> (2.0 requêtes par seconde, rafale de 2)"""
+    rate, _, burst = str(value).partition('/')
+    return float(rate), int(burst or 1)
+
+
+def load_profile(name=None, path=DEFAULT_CONFIG_FILE):
+    """Profil d'exécution `name` du fichier de configuration (section DEFAULT si None)
+
+    Chaque section complète la section DEFAULT ; un fichier absent laisse les
+    valeurs de PROFILE_DEFAULTS.
+    """
+    config = configparser.ConfigParser()
+    config.read(path, encoding='utf-8')
+    if name and not config.has_section(name):
+        available = ', '.join(config.sections()) or 'aucun'
+        raise ValueError(f"Profil inconnu : {name} (profils de {path} : {available})")
+    section = config[name] if name else config[config.default_section]
+    profile = dict(PROFILE_DEFAULTS)
+    for key in PROFILE_DEFAULTS:
+        if key not in section:
+            continue
+        if key in INT_SETTINGS:
+            profile[key] = section.getint(key)
+        elif key in BOOL_SETTINGS:
+            profile[key] = section.getboolean(key)
+        elif key in FLOAT_SETTINGS:
+            profile[key] = section.getfloat(key)
+        else:
+            profile[key] = section[key]
+    for key in ('parcoursup_rate', 'site_rate'):
+        parse_rate(profile[key])  # erreur dès le chargement si la valeur est mal formée
+    profile['name'] = name or 'défaut'
+    return profile
+
+
+def apply_profile(profile):
+    """Applique au processus courant les limites de débit, le contrôle adaptatif et le backend HTML du profil"""
+    import adaptive
+    import fetch_engine
+    import html_parser
+
+    # HOST_RATE_LIMITS ne contient que les hôtes Parcoursup
+    limits = {host: parse_rate(profile['parcoursup_rate']) for host in fetch_engine.HOST_RATE_LIMITS}
+    fetch_engine.rate_limiter = fetch_engine.HostRateLimiter(limits, default=parse_rate(profile['site_rate']))
+    if profile['adaptive']:
+        # parcoursup_rate reste un plafond : seul le débit des sites officiels peut monter
+        fetch_engine.concurrency_controller = adaptive.AdaptiveController(
+            protected=fetch_engine.HOST_RATE_LIMITS, max_rate_factor=profile['max_rate_factor'])
+    else:
+        fetch_engine.concurrency_controller = None
+    if profile['parser'] != 'auto':
+        html_parser.set_parser_backend(profile['parser'])
+
+
+def profile_worker(profile, queue_dir, worker):
+    """Processus de travail d'un traitement réparti, configuré par le profil"""
+    import shards
+
+    apply_profile(profile)
+    shards.work(queue_dir, worker)
+
+
+def scrape_command(profile, args):
+    """Traitement en masse du fichier du profil, sur un ou plusieurs processus"""
+    from http_cache import DEFAULT_CACHE_FILE
+    from incremental import DEFAULT_FINGERPRINT_FILE
+    from scraper_bulk import process_excel_bulk
+
+    apply_profile(profile)
+    options = {
+        'max_workers': profile['max_workers'],
+        'parse_workers': profile['parse_workers'],
+        'deduplicate': profile['deduplicate'],
+        'cache_file': os.path.join(profile['cache_dir'], DEFAULT_CACHE_FILE) if profile['cache'] else None,
+        'fingerprint_file': os.path.join(profile['cache_dir'], DEFAULT_FINGERPRINT_FILE),
+        'baseline': args.baseline,
+        'refresh_after': args.refresh_after,
+    }
+
+    print("=== DÉMARRAGE DU TRAITEMENT EN MASSE ===")
+    print(f"Profil: {profile['name']}")
+    print(f"Fichier: {profile['input_file']}")
+    print(f"Colonne URL: {profile['url_column']}")
+    print(f"Ligne de démarrage: {profile['start_row']}")
+    print(f"Requêtes simultanées: {profile['max_workers']}")
+    print(f"Reprise: {'oui' if args.resume else 'non'}")
+    print("Appuyez sur Ctrl+C pour arrêter si nécessaire")
+
+    if profile['shards']:
+        import shards
+        shards.run_local(profile['input_file'], profile['url_column'], profile['start_row'], profile['shards'],
+                         resume=args.resume, output_format=profile['output_format'],
+                         worker=functools.partial(profile_worker, profile), **options)
+    else:
+        process_excel_bulk(profile['input_file'], profile['url_column'], profile['start_row'], resume=args.resume,
+                           output_format=profile['output_format'], progress=args.progress, **options)
+
+
+def inspect_command(profile, args):
+    """Structure du classeur d'entrée, lue en flux sur ses premières lignes"""
+    from check_excel import check_excel_structure
+
+    check_excel_structure(args.file or profile['input_file'], sample_rows=args.rows, scan_rows=max(args.rows + 1, 10))
+
+
+def report_command(profile, args):
+    """Statistiques de la dernière base de résultats"""
+    from check_results import check_extraction_results
+
+    check_extraction_results(args.file)
+
+
+def fiches_command(profile, args):
+    """Traitement de quelques fiches, ajoutées une par une au classeur (scraper.py)"""
+    from scraper import scrape_and_update_excel
+
+    apply_profile(profile)
+    for url in args.urls:
+        scrape_and_update_excel(url, args.output or profile['input_file'], args.sheet)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=DEFAULT_CONFIG_FILE, help="fichier des profils (par défaut profils.ini)")
+    common.add_argument('--profile', help="profil à utiliser (par défaut la section DEFAULT)")
+
+    parser = argparse.ArgumentParser(description="Extraction des contacts Parcoursup")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scrape_parser = commands.add_parser('scrape', parents=[common], help="traiter le fichier d'entrée")
+    scrape_parser.add_argument('--input', dest='input_file', help="fichier d'entrée")
+    scrape_parser.add_argument('--column', dest='url_column', help="colonne des URLs")
+    scrape_parser.add_argument('--start-row', type=int, help="ligne de démarrage (2 si ligne 1 = en-têtes)")
+    scrape_parser.add_argument('--max-workers', type=int, help="nombre de requêtes simultanées")
+    scrape_parser.add_argument('--resume', action='store_true', help="reprendre le traitement à partir du journal")
+    scrape_parser.add_argument('--parse-workers', type=int, help="nombre de processus d'analyse (0 : analyse dans les threads de téléchargement)")
+    scrape_parser.add_argument('--no-dedup', dest='deduplicate', action='store_false', default=None, help="retraiter chaque ligne même si sa fiche ou son site officiel a déjà été traité")
+    scrape_parser.add_argument('--csv', dest='output_format', action='store_const', const='csv', help="écrire les résultats en CSV plutôt qu'en Excel")
+    scrape_parser.add_argument('--progress', action='store_true', help="afficher la progression et le temps restant estimé")
+    scrape_parser.add_argument('--baseline', help="résultats précédents (.results, .xlsx, .csv ou journal) : ne retraiter que les lignes nouvelles, modifiées ou en erreur")
+    scrape_parser.add_argument('--refresh-after', type=float, help="avec --baseline, retraiter aussi les résultats plus vieux que ce nombre de jours")
+    scrape_parser.add_argument('--shards', type=int, help="répartir les lignes entre ce nombre de processus locaux (voir shards.py)")
+    scrape_parser.set_defaults(handler=scrape_command)
+
+    inspect_parser = commands.add_parser('inspect', parents=[common], help="examiner la structure du fichier d'entrée")
+    inspect_parser.add_argument('file', nargs='?', help="classeur à examiner (par défaut celui du profil)")
+    inspect_parser.add_argument('--rows', type=int, default=5, help="nombre de lignes d'échantillon")
+    inspect_parser.set_defaults(handler=inspect_command)
+
+    report_parser = commands.add_parser('report', parents=[common], help="statistiques des derniers résultats")
+    report_parser.add_argument('file', nargs='?', help="base .results ou fichier de sortie (par défaut le plus récent)")
+    report_parser.set_defaults(handler=report_command)
+
+    fiches_parser = commands.add_parser('fiches', parents=[common], help="traiter quelques fiches et les ajouter à un classeur")
+    fiches_parser.add_argument('urls', nargs='+', metavar='URL', help="URLs des fiches Parcoursup")
+    fiches_parser.add_argument('--output', help="classeur complété (par défaut le fichier d'entrée du profil)")
+    fiches_parser.add_argument('--sheet', default='Sheet1', help="feuille complétée (par défaut Sheet1)")
+    fiches_parser.set_defaults(handler=fiches_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        profile = load_profile(args.profile, args.config)
+    except ValueError as e:
+        parser.error(str(e))
+    # Les options passées en ligne de commande remplacent celles du profil
+    for key in PROFILE_DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            profile[key] = value
+    args.handler(profile, args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,187 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib.robotparser import RobotFileParser
+
+import metrics
+from dedup import domain_key
+from extraction import find_emails_with_context, SKIPPED_EXTENSIONS
+from fetch_engine import fetch
+from html_parser import parse_html
+from http_session import DEFAULT_HEADERS
+from preflight import host_checker
+
+# Indices dans l'URL ou le texte d'un lien signalant une page de contact, avec leur poids
+CONTACT_HINTS = {
+    'nous-contacter': 4,
+    'contact': 3,
+    'scolarit': 3,
+    'secretariat': 2,
+    'secrétariat': 2,
+    'inscription': 2,
+    'pedagog': 2,
+    'pédagog': 2,
+    'admission': 1,
+    'formation': 1,
+}
+
+MAX_PAGES_PER_DOMAIN = 5     # page d'accueil comprise
+DOMAIN_TIME_BUDGET = 20      # secondes par site officiel
+CRAWL_CONCURRENCY = 3        # pages d'un même site téléchargées simultanément
+
+
+def contact_score(href, text):
+    """Score d'un lien d'après les indices de page de contact qu'il contient"""
+    haystack = f'{href} {text}'.lower()
+    return sum(weight for hint, weight in CONTACT_HINTS.items() if hint in haystack)
+
+
+def analyse_page(html, url):
+    """Analyse une page de site officiel : (e-mails classés, liens de contact du même domaine triés)
+
+    Seuls les liens qui contiennent au moins un indice de page de contact
+    (score positif) sont retenus : un site sans indice n'est pas exploré
+    au-delà de sa page d'accueil.
+    Fonction sans accès réseau, utilisable dans un processus séparé.
+    """
+    soup = parse_html(html)
+    emails = find_emails_with_context(soup.get_text(' '))
+
+    domain = domain_key(url)
+    scored = {}
+    for link in soup.find_all('a', href=True):
+        target, _ = urldefrag(urljoin(url, link['href']))
+        parsed = urlparse(target)
+        if parsed.scheme not in ('http', 'https') or domain_key(target) != domain:
+            continue
+        if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            continue
+        score = contact_score(target, link.get_text(' '))
+        if score <= 0:
+            continue
+        if score > scored.get(target, 0):
+            scored[target] = score
+    links = sorted(scored, key=scored.get, reverse=True)
+    return emails, links
+
+
+class RobotsCache:
+    """Règles robots.txt, téléchargées une fois par hôte"""
+
+    def __init__(self, user_agent=DEFAULT_HEADERS['User-Agent']):
+        self.user_agent = user_agent
+        self.parsers = {}
+        self.lock = threading.Lock()
+
+    def parser_for(self, url):
+        parsed = urlparse(url)
+        origin = f'{parsed.scheme}://{parsed.netloc}'
+        with self.lock:
+            parser = self.parsers.get(origin)
+        if parser is not None:
+            return parser
+
+        parser = RobotFileParser()
+        try:
+            response = fetch(f'{origin}/robots.txt', timeout=5)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except Exception:
+            # robots.txt injoignable : on considère le site comme ouvert
+            parser.allow_all = True
+        with self.lock:
+            self.parsers[origin] = parser
+        return parser
+
+    def allowed(self, url):
+        return self.parser_for(url).can_fetch(self.user_agent, url)
+
+
+robots_cache = RobotsCache()
+
+
+NO_CONTACTS = (None, None)
+
+
+def pick_contacts(found, generals):
+    """(e-mail pédagogique, e-mail administratif) du site, None pour un type non trouvé
+
+    Un e-mail classé reste à sa place ; les e-mails sans libellé complètent
+    les places vides, dans l'ordre de la page.
+    """
+    generals = [email for email in generals if email not in found.values()]
+    pedagogical = found.get('pedagogical') or (generals.pop(0) if generals else None)
+    administrative = found.get('administrative') or (generals.pop(0) if generals else None)
+    return pedagogical, administrative
+
+
+def crawl_official_site(url, parse_page=analyse_page, max_pages=MAX_PAGES_PER_DOMAIN,
+                        time_budget=DOMAIN_TIME_BUDGET, concurrency=CRAWL_CONCURRENCY):
+    """Explore un site officiel (accueil puis pages de contact probables) : (pédagogique, administratif)
+
+    S'arrête dès que les e-mails pédagogique et administratif sont trouvés, après
+    `max_pages` pages ou quand le budget de temps du domaine est épuisé.
+    `parse_page(html, url)` permet de déporter l'analyse (voir pipeline.py).
+    """
+    deadline = time.monotonic() + time_budget
+    found = {}
+    generals = []
+    # Les requêtes sont comptées pour la ligne en cours ; leur durée l'est dans l'étape 'official'
+    row = metrics.current()
+
+    def visit(page_url):
+        with metrics.tracking(row, timings=False):
+            if not robots_cache.allowed(page_url):
+                return [], []
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], []
+            response = fetch(page_url, timeout=min(10, remaining))
+            response.raise_for_status()
+            if 'html' not in response.headers.get('Content-Type', 'text/html'):
+                return [], []
+            return parse_page(response.text, response.url or page_url)
+
+    def record(emails):
+        for email, kind in emails:
+            if kind == 'general':
+                if email not in generals:
+                    generals.append(email)
+            elif kind not in found:
+                found[kind] = email
+        return 'pedagogical' in found and 'administrative' in found
+
+    # Hôte mort, nom inconnu ou lien vers un document : inutile d'explorer
+    with metrics.tracking(row, timings=False):
+        if host_checker.check_page(url):
+            return NO_CONTACTS
+
+    try:
+        emails, links = visit(url)
+    except Exception:
+        return NO_CONTACTS
+    if record(emails) or max_pages <= 1:
+        return pick_contacts(found, generals)
+
+    candidates = [link for link in links if link.rstrip('/') != url.rstrip('/')][:max_pages - 1]
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = [executor.submit(visit, link) for link in candidates]
+        for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+            try:
+                emails, _ = future.result()
+            except Exception:
+                continue
+            if record(emails):
+                break
+    except TimeoutError:
+        pass
+    finally:
+        # Les pages restantes sont abandonnées : un site lent ne bloque pas le traitement
+        executor.shutdown(wait=False, cancel_futures=True)
+    return pick_contacts(found, generals)
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+import metrics
+from http_cache import normalize_url
+
+
+def fiche_key(url):
+    """Clé de déduplication d'une fiche Parcoursup (URL normalisée, g_ta_cod)"""
+    return normalize_url(str(url))
+
+
+def domain_key(url):
+    """Clé de déduplication d'un site officiel : son domaine, sans "www." """
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class DedupIndex:
+    """Index des résultats déjà calculés pendant un traitement
+
+    Chaque clé (type, valeur) est associée à un Future : le premier demandeur
+    calcule le résultat, les suivants le réutilisent (ou l'attendent s'il est
+    encore en cours).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.unique = {'fiche': 0, 'official': 0}
+        self.saved = {'fiche': 0, 'official': 0}
+
+    def claim(self, kind, key):
+        """Renvoie (future, True) pour le premier demandeur, (future, False) pour les suivants"""
+        with self.lock:
+            future = self.futures.get((kind, key))
+            if future is None:
+                future = Future()
+                self.futures[(kind, key)] = future
+                self.unique[kind] += 1
+                return future, True
+            self.saved[kind] += 1
+            return future, False
+
+    def once(self, kind, key, compute):
+        """Calcule compute() une seule fois par clé et renvoie le résultat partagé"""
+        future, leader = self.claim(kind, key)
+        if leader:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+        else:
+            metrics.count('dedup_hits')
+        return future.result()
+
+    def report(self):
+        """Résumé des requêtes évitées"""
+        return (f"Déduplication : {self.unique['fiche']} fiches uniques ({self.saved['fiche']} évitées), "
+                f"{self.unique['official']} sites officiels uniques ({self.saved['official']} évités)")
+
+
+dedup_index = None
+
+
+def enable_dedup():
+    """Active l'index de déduplication partagé"""
+    global dedup_index
+    dedup_index = DedupIndex()
+    return dedup_index
+
+
+def disable_dedup():
+    global dedup_index
+    dedup_index = None
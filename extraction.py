@@ -0,0 +1,230 @@
+import re
+from urllib.parse import urlsplit
+
+from bs4 import NavigableString
+
+import metrics
+from html_parser import parse_links, parse_contact_soup
+
+NOT_FOUND = 'Non trouvé'
+
+# Motifs compilés une seule fois au chargement du module
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+PEDAGOGICAL_RE = re.compile(r'p[ée]dagogi', re.IGNORECASE)
+ADMINISTRATIVE_RE = re.compile(r'administrati|scolarit', re.IGNORECASE)
+CONTACT_HEADING_RE = re.compile('Contacter et échanger')
+
+# Nombre de niveaux de parents explorés autour du titre de la section contact
+MAX_PARENT_LEVELS = 5
+
+# Nombre de caractères de texte précédant un e-mail utilisés pour le classer
+CONTEXT_CHARS = 120
+
+# Domaines des fiches à traiter (sous-domaines compris)
+FICHE_DOMAINS = {'parcoursup.fr'}
+
+# Liens jamais retenus comme site officiel : Parcoursup, sites ministériels, réseaux sociaux, documents
+EXCLUDED_HOST_KEYWORDS = ('parcoursup',)
+EXCLUDED_OFFICIAL_DOMAINS = (
+    'gouv.fr', 'facebook.com', 'twitter.com', 'x.com', 'instagram.com', 'linkedin.com',
+    'youtube.com', 'youtu.be', 'tiktok.com', 'snapchat.com', 'pinterest.com', 'google.com', 'goo.gl',
+)
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.zip')
+
+
+def extract_emails_from_text(text):
+    """Extrait tous les e-mails d'un texte"""
+    return EMAIL_RE.findall(text)
+
+
+def classify_email(context):
+    """Classe un e-mail ('pedagogical', 'administrative' ou 'general') d'après le texte qui l'entoure"""
+    if PEDAGOGICAL_RE.search(context):
+        return 'pedagogical'
+    if ADMINISTRATIVE_RE.search(context):
+        return 'administrative'
+    return 'general'
+
+
+def find_emails_with_context(text):
+    """Liste des (e-mail, type) d'un texte, chaque e-mail classé d'après le texte qui le précède"""
+    emails = []
+    seen = set()
+    previous_end = 0
+    for match in EMAIL_RE.finditer(text):
+        email = match.group()
+        if email not in seen:
+            seen.add(email)
+            context = text[max(previous_end, match.start() - CONTEXT_CHARS):match.start()] + email
+            emails.append((email, classify_email(context)))
+        previous_end = match.end()
+    return emails
+
+
+def find_contact_section(soup):
+    """Trouve le titre "Contacter et échanger avec l'établissement" dans la page"""
+    heading = soup.find('h3', string=CONTACT_HEADING_RE)
+    if heading is None:
+        heading = soup.find(string=CONTACT_HEADING_RE)
+    return heading
+
+
+def iter_new_strings(ancestor, scanned):
+    """Textes de `ancestor` en excluant le sous-arbre `scanned` déjà parcouru"""
+    for child in ancestor.children:
+        if child is scanned:
+            continue
+        if isinstance(child, NavigableString):
+            # Les commentaires HTML sont ignorés, comme dans Tag.strings
+            if type(child) is NavigableString:
+                yield child
+        else:
+            yield from child.strings
+
+
+def find_emails_near(heading):
+    """Liste des (e-mail, contexte) du plus petit parent du titre qui contient des e-mails
+
+    Chaque nœud texte n'est lu qu'une fois : le premier parent est lu en entier,
+    titre compris (un e-mail peut figurer dans le titre lui-même), puis à chaque
+    niveau seuls les textes hors du niveau précédent (déjà sans e-mail) sont parcourus.
+    Le contexte d'un e-mail est le texte qui le précède, arrêté à l'e-mail
+    précédent pour ne pas hériter de son libellé.
+    """
+    scanned = None
+    ancestor = heading.parent
+    for _ in range(MAX_PARENT_LEVELS):
+        if ancestor is None:
+            break
+        emails = []
+        seen = set()
+        text_so_far = ''
+        for string in iter_new_strings(ancestor, scanned):
+            if '@' not in string:
+                text_so_far = (text_so_far + string)[-CONTEXT_CHARS:]
+                continue
+            previous_end = 0
+            for match in EMAIL_RE.finditer(string):
+                email = match.group()
+                context = (text_so_far + string[previous_end:match.start()])[-CONTEXT_CHARS:] + email
+                if email not in seen:
+                    seen.add(email)
+                    emails.append((email, context))
+                previous_end = match.end()
+                text_so_far = ''
+            text_so_far = (text_so_far + string[previous_end:])[-CONTEXT_CHARS:]
+        if emails:
+            return emails
+        scanned = ancestor
+        ancestor = ancestor.parent
+    return []
+
+
+def extract_contacts_from_soup(soup):
+    """Extrait (contact général, mail pédagogique, mail administratif) de la fiche Parcoursup"""
+    pedagogical_email = NOT_FOUND
+    admin_email = NOT_FOUND
+    general_contact = NOT_FOUND
+
+    heading = find_contact_section(soup)
+    if heading is None:
+        return general_contact, pedagogical_email, admin_email
+
+    emails = find_emails_near(heading)
+    for email, context in emails:
+        kind = classify_email(context)
+        if kind == 'pedagogical' and pedagogical_email == NOT_FOUND:
+            pedagogical_email = email
+        elif kind == 'administrative' and admin_email == NOT_FOUND:
+            admin_email = email
+        elif general_contact == NOT_FOUND:
+            general_contact = email
+
+    # Sans libellé explicite, on répartit les e-mails dans l'ordre de la page
+    addresses = [email for email, _ in emails]
+    if len(addresses) >= 2:
+        if pedagogical_email == NOT_FOUND:
+            pedagogical_email = addresses[0]
+        if admin_email == NOT_FOUND:
+            admin_email = addresses[1]
+    elif len(addresses) == 1:
+        if pedagogical_email == NOT_FOUND:
+            pedagogical_email = addresses[0]
+
+    return general_contact, pedagogical_email, admin_email
+
+
+def host_in(host, domains):
+    """Vrai si l'hôte est l'un des domaines ou l'un de leurs sous-domaines"""
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def is_parcoursup_url(url):
+    """Vrai si la cellule contient une URL http(s) d'une fiche Parcoursup à traiter"""
+    if not url:
+        return False
+    try:
+        parsed = urlsplit(str(url).strip())
+    except ValueError:
+        return False
+    return parsed.scheme in ('http', 'https') and host_in((parsed.hostname or ''), FICHE_DOMAINS)
+
+
+def is_official_site_candidate(href):
+    """Vrai si un lien de la fiche peut être le site officiel (ni réseau social, ni document)"""
+    try:
+        parsed = urlsplit(href.strip())
+    except ValueError:
+        return False
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    if any(keyword in host for keyword in EXCLUDED_HOST_KEYWORDS) or host_in(host, EXCLUDED_OFFICIAL_DOMAINS):
+        return False
+    return not parsed.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+
+def get_official_website_from_parcoursup(soup):
+    """Extrait le site officiel de l'établissement depuis la page Parcoursup"""
+    try:
+        website_links = soup.find_all('a', href=True)
+        for link in website_links:
+            href = link['href']
+            if is_official_site_candidate(href):
+                return href.strip()
+    except:
+        pass
+    return None
+
+
+def parse_fiche(html):
+    """Analyse une fiche Parcoursup brute : (contacts, site officiel à explorer ou None)
+
+    Fonction sans accès réseau, utilisable dans un processus séparé.
+    """
+    with metrics.timed('parse'):
+        soup, full_page = parse_contact_soup(html)
+    with metrics.timed('extract'):
+        contacts = extract_contacts_from_soup(soup)
+    official_site = None
+    if contacts[1] == NOT_FOUND and contacts[2] == NOT_FOUND:
+        # Page entière déjà parsée (fragment sans e-mail) : ses liens sont réutilisés
+        if full_page:
+            links = soup
+        else:
+            with metrics.timed('parse'):
+                links = parse_links(html)
+        with metrics.timed('extract'):
+            official_site = get_official_website_from_parcoursup(links)
+    return contacts, official_site
+
+
+def merge_official_emails(contacts, emails_from_site):
+    """Complète les contacts Parcoursup avec les e-mails (pédagogique, administratif) du site officiel
+
+    Chaque e-mail trouvé remplace le contact du même type ; None (ou aucun
+    résultat) laisse la valeur Parcoursup.
+    """
+    general_contact, pedagogical_email, admin_email = contacts
+    pedagogical, administrative = emails_from_site or (None, None)
+    return general_contact, pedagogical or pedagogical_email, administrative or admin_email
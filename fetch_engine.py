@@ -0,0 +1,271 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import http_cache
+import metrics
+from adaptive import AdaptiveController, THROTTLE_STATUSES, parse_retry_after
+from http_session import get_session
+
+# Limites de débit par hôte : (requêtes par seconde, rafale maximale)
+HOST_RATE_LIMITS = {
+    'dossierappel.parcoursup.fr': (2.0, 2),
+}
+
+# Limite appliquée aux autres hôtes (sites officiels des établissements)
+DEFAULT_RATE_LIMIT = (1.0, 2)
+
+# Nombre de requêtes simultanées par défaut
+DEFAULT_MAX_WORKERS = 8
+
+
+class TokenBucket:
+    """Seau à jetons : autorise `rate` requêtes par seconde avec une rafale de `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un jeton soit disponible"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        """Change le débit (contrôle adaptatif) ; les jetons déjà accumulés sont conservés"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = rate
+
+
+class HostRateLimiter:
+    """Associe un seau à jetons à chaque hôte contacté"""
+
+    def __init__(self, limits=None, default=DEFAULT_RATE_LIMIT):
+        self.limits = dict(HOST_RATE_LIMITS if limits is None else limits)
+        self.default = default
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(self, host, rate, burst=1):
+        """Définit la limite de débit d'un hôte"""
+        with self.lock:
+            self.limits[host] = (rate, burst)
+            self.buckets.pop(host, None)
+
+    def bucket_for(self, host):
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.default)
+                bucket = TokenBucket(rate, burst)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """Attend le droit d'envoyer une requête vers l'hôte de l'URL"""
+        host = urlparse(url).hostname or ''
+        self.bucket_for(host).acquire()
+
+
+rate_limiter = HostRateLimiter()
+
+# Contrôle adaptatif des requêtes simultanées et du débit par hôte (None pour le désactiver) ;
+# les hôtes Parcoursup ne dépassent jamais leur limite de HOST_RATE_LIMITS
+concurrency_controller = AdaptiveController(protected=HOST_RATE_LIMITS)
+
+# Nouvelles tentatives après une réponse 429/503
+THROTTLE_RETRIES = 3
+
+# Délai maximal d'établissement d'une connexion (le délai de lecture reste celui passé à fetch)
+CONNECT_TIMEOUT = 5
+
+DEAD_HOST_FAILURES = 3       # échecs de connexion consécutifs avant d'abandonner un hôte
+DEAD_HOST_TTL = 600          # secondes pendant lesquelles un hôte injoignable n'est plus contacté
+
+
+class DeadHostError(requests.ConnectionError):
+    """Hôte connu comme injoignable : requête abandonnée sans attendre de délai"""
+
+
+def is_unreachable(error):
+    """Vrai si l'erreur montre que l'hôte est injoignable (DNS, connexion refusée ou délai de connexion)
+
+    Un délai de lecture ou une connexion coupée en cours de réponse vient d'un
+    serveur lent ou surchargé, pas d'un hôte mort : ces erreurs ne comptent pas.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.Timeout) or not isinstance(error, requests.ConnectionError):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class DeadHostCache:
+    """Cache négatif des hôtes injoignables (DNS en échec, connexions refusées ou expirées)
+
+    Les hôtes `protected` (fiches Parcoursup) ne sont jamais écartés : toutes
+    les lignes en dépendent.
+    """
+
+    def __init__(self, failures=DEAD_HOST_FAILURES, ttl=DEAD_HOST_TTL, protected=()):
+        self.failures = failures
+        self.ttl = ttl
+        self.protected = set(protected)
+        self.counts = {}
+        self.dead = {}
+        self.avoided = 0
+        self.lock = threading.Lock()
+
+    def is_dead(self, host):
+        with self.lock:
+            until = self.dead.get(host)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self.dead[host]
+                return False
+            self.avoided += 1
+            return True
+
+    def mark_dead(self, host):
+        if host in self.protected:
+            return
+        with self.lock:
+            self.dead[host] = time.monotonic() + self.ttl
+            self.counts.pop(host, None)
+
+    def failure(self, host):
+        if host in self.protected:
+            return
+        with self.lock:
+            self.counts[host] = self.counts.get(host, 0) + 1
+            if self.counts[host] >= self.failures:
+                self.dead[host] = time.monotonic() + self.ttl
+                del self.counts[host]
+
+    def success(self, host):
+        if host in self.counts:
+            with self.lock:
+                self.counts.pop(host, None)
+
+    def report(self):
+        return f"Hôtes injoignables : {len(self.dead)} ({self.avoided} requêtes évitées)"
+
+
+dead_hosts = DeadHostCache(protected=HOST_RATE_LIMITS)
+
+
+def fetch(url, timeout=15):
+    """Effectue un GET via la session partagée en respectant la limite de débit de l'hôte
+
+    Si le cache disque est actif (http_cache.enable_cache), une réponse fraîche est
+    servie sans requête, et une réponse expirée est revalidée par ETag/Last-Modified.
+    """
+    cache = http_cache.response_cache
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        cache.hit(entry)
+        metrics.count('cache_hits')
+        return cache.to_response(entry)
+
+    headers = cache.conditional_headers(entry) if entry else None
+    for attempt in range(THROTTLE_RETRIES + 1):
+        response = request(url, timeout, headers)
+        # Sur 429/503, le contrôleur a réduit la concurrence et mis l'hôte en pause (Retry-After)
+        if response.status_code not in THROTTLE_STATUSES:
+            break
+        if concurrency_controller is None and attempt < THROTTLE_RETRIES:
+            time.sleep(parse_retry_after(response.headers.get('Retry-After')))
+
+    if cache:
+        if response.status_code == 304 and entry:
+            cache.hit(entry, revalidated=True)
+            metrics.count('cache_hits')
+            return cache.to_response(entry)
+        cache.miss()
+        if response.status_code == 200:
+            cache.store(url, response)
+    return response
+
+
+def head(url, timeout=10):
+    """HEAD (redirections suivies) soumis aux mêmes limites que fetch, sans cache"""
+    return request(url, timeout, method='HEAD')
+
+
+def request(url, timeout, headers=None, method='GET'):
+    """Requête refusée d'emblée si l'hôte est connu comme injoignable ; les échecs de connexion (pas de lecture) sont comptés"""
+    host = urlparse(url).hostname or ''
+    if dead_hosts.is_dead(host):
+        raise DeadHostError(f"{host} injoignable (échecs récents), requête abandonnée")
+    try:
+        response = throttled_request(url, (min(CONNECT_TIMEOUT, timeout), timeout), headers, method)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if is_unreachable(e):
+            dead_hosts.failure(host)
+        raise
+    dead_hosts.success(host)
+    return response
+
+
+def throttled_request(url, timeout, headers=None, method='GET'):
+    """Requête soumise au contrôleur de concurrence de l'hôte puis à sa limite de débit
+
+    Avec le contrôle adaptatif, la limite de débit de l'hôte est elle aussi
+    ajustée par le contrôleur (voir adaptive.HostController).
+    """
+    if concurrency_controller is None:
+        with metrics.timed('wait'):
+            rate_limiter.acquire(url)
+        return session_request(url, timeout, headers, method)
+    queued = time.monotonic()
+    bucket = rate_limiter.bucket_for(urlparse(url).hostname or '')
+    with concurrency_controller.slot(url, bucket) as slot:
+        bucket.acquire()
+        slot.begin()
+        metrics.add('wait', slot.start - queued)
+        response = session_request(url, timeout, headers, method)
+        slot.observe(response)
+    return response
+
+
+def session_request(url, timeout, headers=None, method='GET'):
+    """Requête via la session partagée ; durée et octets reçus comptés dans les mesures de la ligne"""
+    with metrics.timed('download', exclude='connect'):
+        response = get_session().request(method, url, timeout=timeout, headers=headers, allow_redirects=True)
+    metrics.count('requests')
+    metrics.count('bytes', response.raw.tell() if hasattr(response.raw, 'tell') else len(response.content))
+    return response
+
+
+def map_ordered(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Applique func à chaque élément en parallèle et renvoie les résultats dans l'ordre d'entrée"""
+    window = max_workers * 2
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,98 @@
+import importlib.util
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Backends BeautifulSoup par ordre de préférence (du plus rapide au plus lent)
+PREFERRED_BACKENDS = ('lxml', 'html.parser')
+
+# Marqueurs du titre de la section contact dans le HTML brut
+CONTACT_MARKERS = ('Contacter et échanger', 'Contacter et &eacute;changer', 'Contacter et &#233;changer')
+
+# Titres <h2>/<h3> du HTML brut, contenu compris (balises internes comprises)
+HEADING_RE = re.compile(r'<h([23])\b[^>]*>(.*?)</h\1\s*>', re.IGNORECASE | re.DOTALL)
+
+# Arobase d'un e-mail dans le HTML brut, littéral ou en entité
+AT_SIGN_RE = re.compile(r'@|&#0*64;|&#x0*40;|&commat;', re.IGNORECASE)
+
+# Taille du fragment parsé autour du titre de la section contact
+FRAGMENT_BEFORE = 2000
+FRAGMENT_AFTER = 6000
+
+LINKS_ONLY = SoupStrainer('a', href=True)
+
+
+def available_backends():
+    """Backends installés, par ordre de préférence"""
+    return [name for name in PREFERRED_BACKENDS if name == 'html.parser' or importlib.util.find_spec(name)]
+
+
+parser_backend = available_backends()[0]
+
+
+def set_parser_backend(name):
+    """Choisit le backend utilisé par parse_html ('lxml' ou 'html.parser')"""
+    global parser_backend
+    if name not in available_backends():
+        raise ValueError(f"Backend HTML indisponible : {name} (installés : {', '.join(available_backends())})")
+    parser_backend = name
+
+
+def parse_html(html, parse_only=None, backend=None):
+    """Parse une page complète (ou seulement les éléments retenus par `parse_only`)"""
+    return BeautifulSoup(html, backend or parser_backend, parse_only=parse_only)
+
+
+def parse_links(html, backend=None):
+    """Parse uniquement les liens <a href> d'une page"""
+    return parse_html(html, parse_only=LINKS_ONLY, backend=backend)
+
+
+def find_contact_marker(html):
+    """Position du titre de la section contact dans le HTML brut, ou -1
+
+    Le titre <h2>/<h3> qui contient un marqueur est préféré à la première
+    occurrence du marqueur, qui peut se trouver ailleurs (menu, texte).
+    """
+    for heading in HEADING_RE.finditer(html):
+        if any(marker in heading.group(2) for marker in CONTACT_MARKERS):
+            return heading.start()
+    for marker in CONTACT_MARKERS:
+        position = html.find(marker)
+        if position != -1:
+            return position
+    return -1
+
+
+def contact_fragment(html):
+    """Extrait du HTML brut le fragment entourant la section contact, ou None"""
+    position = find_contact_marker(html)
+    if position == -1:
+        return None
+    # Le fragment commence et finit sur une balise pour ne pas couper un élément en deux
+    start = max(html.rfind('<', 0, max(position - FRAGMENT_BEFORE, 0) + 1), 0)
+    end = html.find('>', position + FRAGMENT_AFTER)
+    end = len(html) if end == -1 else end + 1
+    return html[start:end]
+
+
+def parse_contact_soup(html, backend=None):
+    """(soup, page entière) : fragment de la section contact, ou page entière à défaut
+
+    La page entière est parsée si le titre n'est pas trouvé dans le HTML brut,
+    ou si le texte du fragment ne contient aucun e-mail (section plus longue
+    que le fragment). L'appelant peut alors réutiliser ce soup au lieu de
+    reparser la page (liens vers le site officiel). Un fragment sans arobase
+    dans le HTML brut n'est pas parsé du tout.
+    """
+    fragment = contact_fragment(html)
+    if fragment is not None and AT_SIGN_RE.search(fragment):
+        soup = parse_html(fragment, backend=backend)
+        if '@' in soup.get_text():
+            return soup, False
+    return parse_html(html, backend=backend), True
+
+
+def parse_contact_section(html, backend=None):
+    """Parse uniquement le fragment de la fiche autour de la section contact (voir parse_contact_soup)"""
+    return parse_contact_soup(html, backend)[0]
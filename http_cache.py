@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+import requests
+
+DEFAULT_CACHE_FILE = '.http_cache.sqlite'
+DEFAULT_TTL = 7 * 24 * 3600            # une semaine
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024  # 500 Mo compressés
+
+# Paramètres de requête sans effet sur le contenu, ignorés dans la clé de cache
+IGNORED_QUERY_PARAMS = {
+    'dossierappel.parcoursup.fr': {'typeBac', 'originePc'},
+}
+
+
+def normalize_url(url):
+    """Normalise une URL pour en faire une clé de cache stable"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+    netloc = host if parsed.port is None else f'{host}:{parsed.port}'
+    ignored = IGNORED_QUERY_PARAMS.get(host, set())
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k not in ignored)
+    return urlunparse((parsed.scheme.lower(), netloc, parsed.path or '/', '', urlencode(query), ''))
+
+
+class ResponseCache:
+    """Cache disque (SQLite) des réponses HTTP, compressées, avec TTL et éviction LRU"""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.lock = threading.Lock()
+        # Fichier partagé par les processus d'un traitement réparti (shards.py) :
+        # lectures concurrentes (WAL) et attente du verrou d'écriture
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, url TEXT, body BLOB, size INTEGER, headers TEXT, '
+            'fetched_at REAL, last_access REAL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self.db.commit()
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def lookup(self, url):
+        """Renvoie l'entrée en cache (dict) ou None"""
+        key = normalize_url(url)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT url, body, headers, fetched_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'key': key,
+            'url': row[0],
+            'body': row[1],
+            'headers': json.loads(row[2]),
+            'fetched_at': row[3],
+        }
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """En-têtes de revalidation (If-None-Match / If-Modified-Since)"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def store(self, url, response):
+        """Enregistre une réponse 200 dans le cache"""
+        body = zlib.compress(response.content)
+        headers = {
+            name: response.headers[name]
+            for name in ('Content-Type', 'ETag', 'Last-Modified')
+            if name in response.headers
+        }
+        headers['encoding'] = response.encoding
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            previous = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, body, len(body), json.dumps(headers), now, now),
+            )
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            self.evict()
+            self.db.commit()
+
+    def hit(self, entry, revalidated=False):
+        """Comptabilise un accès réussi et met à jour les dates de l'entrée"""
+        now = time.time()
+        with self.lock:
+            self.hits += 1
+            if revalidated:
+                self.revalidated += 1
+                self.db.execute('UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?', (now, now, entry['key']))
+            else:
+                self.db.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, entry['key']))
+            self.db.commit()
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        while self.total_bytes > self.max_bytes:
+            rows = self.db.execute('SELECT key, size FROM responses ORDER BY last_access LIMIT 100').fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for key, size in rows:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def to_response(self, entry):
+        """Reconstruit un objet requests.Response à partir d'une entrée"""
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response._content = zlib.decompress(entry['body'])
+        response.encoding = entry['headers'].get('encoding')
+        for name in ('Content-Type', 'ETag', 'Last-Modified'):
+            if name in entry['headers']:
+                response.headers[name] = entry['headers'][name]
+        return response
+
+    def report(self):
+        """Résumé des accès au cache"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return (f"Cache HTTP : {self.hits} hits ({self.revalidated} revalidés), "
+                f"{self.misses} misses, taux {rate:.1f}% - {self.total_bytes / 1024 / 1024:.1f} Mo")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+response_cache = None
+
+
+def enable_cache(path=DEFAULT_CACHE_FILE, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+    """Active le cache disque partagé utilisé par fetch_engine.fetch"""
+    global response_cache
+    disable_cache()
+    response_cache = ResponseCache(path, ttl, max_bytes)
+    return response_cache
+
+
+def disable_cache():
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None
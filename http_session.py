@@ -0,0 +1,106 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+
+try:
+    import brotli  # noqa: F401 - urllib3 décode "br" si le module est présent
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Configuration par défaut de la session partagée
+SESSION_CONFIG = {
+    'pool_connections': 100,   # nombre d'hôtes gardés en cache de pools
+    'pool_maxsize': 16,        # connexions keep-alive conservées par hôte
+    'retries': 3,              # nouvelles tentatives sur 5xx et erreurs de lecture
+    # Aucune nouvelle tentative sur échec de connexion (DNS, refus, délai de connexion) :
+    # l'hôte injoignable est écarté par fetch_engine.dead_hosts sans attendre plusieurs délais
+    'connect_retries': 0,
+    'backoff_factor': 0.5,     # attente 0.5s, 1s, 2s... entre les tentatives
+    # 429 et 503 sont traités par fetch_engine.fetch, qui ralentit l'hôte (adaptive.py)
+    'status_forcelist': (500, 502, 504),
+    'adapter_class': HTTPAdapter,  # remplacé par replay.ReplayAdapter pour rejouer un corpus enregistré
+}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; scraper-parcoursup)',
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """Connexion dont l'établissement (DNS + TCP) est compté dans l'étape 'connect'"""
+
+    def connect(self):
+        with metrics.timed('connect'):
+            super().connect()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """Connexion dont l'établissement (DNS + TCP + TLS) est compté dans l'étape 'connect'"""
+
+    def connect(self):
+        with metrics.timed('connect'):
+            super().connect()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_connections, pool_maxsize, retries, backoff_factor, status_forcelist, adapter_class=HTTPAdapter,
+                  connect_retries=0):
+    """Crée une session HTTP avec pool de connexions et nouvelles tentatives"""
+    retry = Retry(
+        total=retries,
+        connect=connect_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        # Retry-After est géré par le contrôleur adaptatif de fetch_engine
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = adapter_class(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    adapter.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Renvoie la session partagée (créée au premier appel)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session(**SESSION_CONFIG)
+        return _session
+
+
+def configure_session(**options):
+    """Modifie la configuration de la session partagée et la recrée"""
+    global _session
+    with _session_lock:
+        SESSION_CONFIG.update(options)
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,167 @@
+import csv
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import openpyxl
+
+from checkpoint import OUTPUT_HEADERS, iter_journal_records, is_finished, record_to_row, row_to_record
+from dedup import fiche_key
+from result_store import RESULTS_EXTENSION, ResultStore
+
+DEFAULT_FINGERPRINT_FILE = '.fingerprints.sqlite'
+
+# Raisons de retraiter une ligne lors d'une mise à jour incrémentale
+NEW = 'nouvelle'
+URL_CHANGED = 'URL modifiée'
+ERRORED = 'en erreur'
+STALE = 'périmée'
+
+
+def read_output_file(path):
+    """Enregistrements d'un fichier de résultats précédent (.results, .xlsx, .csv ou journal .jsonl)"""
+    if path.endswith('.jsonl'):
+        yield from iter_journal_records(path)
+    elif path.endswith(RESULTS_EXTENSION):
+        yield from ResultStore.load(path).records()
+    elif path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f, delimiter=';')
+            next(reader, None)
+            for values in reader:
+                values[0] = int(values[0])
+                values[6] = datetime.datetime.fromisoformat(values[6])
+                yield row_to_record(values)
+    else:
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            for values in wb.active.iter_rows(min_row=2, max_col=len(OUTPUT_HEADERS), values_only=True):
+                if values[0] is None:
+                    continue
+                values = list(values)
+                if not isinstance(values[6], datetime.datetime):
+                    values[6] = datetime.datetime.fromisoformat(str(values[6]))
+                yield row_to_record(values)
+        finally:
+            wb.close()
+
+
+class Baseline:
+    """Résultats d'un traitement précédent, pour ne retraiter que les lignes qui le nécessitent
+
+    Une ligne est retraitée si elle est nouvelle, si son URL a changé, si elle
+    était en erreur ou si son résultat est plus vieux que `max_age` (timedelta).
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self.records = {record['row']: record for record in read_output_file(path)}
+        self.reasons = {}
+        self.kept = 0
+
+    def reason_to_process(self, row_num, url, now=None):
+        """Raison de retraiter la ligne, ou None si le résultat précédent est conservé"""
+        record = self.records.get(row_num)
+        if record is None:
+            reason = NEW
+        elif fiche_key(url) != fiche_key(record['url']):
+            reason = URL_CHANGED
+        elif not is_finished(record):
+            reason = ERRORED
+        elif self.max_age and (now or datetime.datetime.now()) - datetime.datetime.fromisoformat(record['timestamp']) > self.max_age:
+            reason = STALE
+        else:
+            self.kept += 1
+            return None
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return reason
+
+    def previous_row(self, row_num):
+        """Ligne de sortie du traitement précédent (horodatage d'origine conservé)"""
+        return record_to_row(self.records[row_num])
+
+    def report(self):
+        details = ', '.join(f'{reason} : {count}' for reason, count in sorted(self.reasons.items()))
+        return f"Mise à jour incrémentale : {self.kept} lignes conservées de {self.path}, à retraiter : {details or 'aucune'}"
+
+
+def page_digest(content):
+    """Empreinte du contenu brut d'une page"""
+    return hashlib.sha1(content).hexdigest()
+
+
+class FingerprintStore:
+    """Empreintes des fiches déjà analysées (SQLite) et contacts obtenus
+
+    Avec `reuse=True`, une fiche dont le contenu n'a pas changé depuis la dernière
+    analyse n'est ni reparsée, ni suivie vers son site officiel : ses contacts
+    sont réutilisés. Sinon les empreintes sont seulement enregistrées (traitement
+    complet, par exemple après une modification de l'extraction).
+    """
+
+    def __init__(self, path=DEFAULT_FINGERPRINT_FILE, reuse=True):
+        self.path = path
+        self.reuse = reuse
+        self.unchanged = 0
+        self.changed = 0
+        self.lock = threading.Lock()
+        # Fichier partagé par les processus d'un traitement réparti (shards.py) :
+        # lectures concurrentes (WAL) et attente du verrou d'écriture
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            'key TEXT PRIMARY KEY, digest TEXT NOT NULL, contacts TEXT NOT NULL, updated REAL NOT NULL)'
+        )
+        self.db.commit()
+
+    def lookup(self, url, digest):
+        """Contacts de la dernière analyse si la page n'a pas changé, sinon None"""
+        if not self.reuse:
+            return None
+        with self.lock:
+            row = self.db.execute('SELECT digest, contacts FROM fingerprints WHERE key = ?', (fiche_key(url),)).fetchone()
+            if row is None or row[0] != digest:
+                self.changed += 1
+                return None
+            self.unchanged += 1
+        return tuple(json.loads(row[1]))
+
+    def store(self, url, digest, contacts):
+        if 'Erreur' in contacts:
+            return
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO fingerprints (key, digest, contacts, updated) VALUES (?, ?, ?, ?)',
+                (fiche_key(url), digest, json.dumps(list(contacts), ensure_ascii=False), time.time()),
+            )
+            self.db.commit()
+
+    def report(self):
+        return f"Empreintes : {self.unchanged} fiches inchangées (analyse évitée), {self.changed} nouvelles ou modifiées"
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+fingerprint_store = None
+
+
+def enable_fingerprints(path=DEFAULT_FINGERPRINT_FILE, reuse=True):
+    """Active le magasin d'empreintes partagé"""
+    global fingerprint_store
+    disable_fingerprints()
+    fingerprint_store = FingerprintStore(path, reuse)
+    return fingerprint_store
+
+
+def disable_fingerprints():
+    global fingerprint_store
+    if fingerprint_store is not None:
+        fingerprint_store.close()
+    fingerprint_store = None
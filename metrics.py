@@ -0,0 +1,233 @@
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+# Étapes mesurées pour chaque ligne (secondes)
+STAGES = ('wait', 'connect', 'download', 'parse', 'extract', 'official', 'write')
+COUNTERS = ('requests', 'bytes', 'cache_hits', 'dedup_hits', 'unchanged_pages')
+
+PROGRESS_INTERVAL = 1.0      # secondes entre deux rafraîchissements de la ligne de progression
+
+_local = threading.local()
+
+
+def default_metrics_file(input_file):
+    """Chemin du fichier de mesures associé à un fichier d'entrée"""
+    return f"{os.path.splitext(input_file)[0]}.metrics.jsonl"
+
+
+class RowMetrics:
+    """Temps par étape et compteurs d'une ligne"""
+
+    __slots__ = ('row', 'started', 'timings', 'counters')
+
+    def __init__(self, row=None):
+        self.row = row
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.counters = {}
+
+    def add(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Ajoute les mesures d'une autre ligne (mesures faites dans un processus d'analyse)"""
+        for stage, seconds in other.timings.items():
+            self.add(stage, seconds)
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_record(self, status, total):
+        record = {'row': self.row, 'status': status, 'total': round(total, 6)}
+        for stage in STAGES:
+            record[stage] = round(self.timings.get(stage, 0.0), 6)
+        for name in COUNTERS:
+            record[name] = self.counters.get(name, 0)
+        return record
+
+
+def current():
+    """Mesures de la ligne traitée par le thread courant (None hors traitement)"""
+    return getattr(_local, 'row', None)
+
+
+@contextmanager
+def tracking(row, timings=True):
+    """Rattache le thread courant à une ligne
+
+    Avec `timings=False`, seuls les compteurs (requêtes, octets, cache) sont
+    relevés : utilisé par les threads d'exploration des sites officiels, dont
+    le temps est déjà compté dans l'étape 'official'.
+    """
+    previous = getattr(_local, 'row', None), getattr(_local, 'timings', True)
+    _local.row, _local.timings = row, timings
+    try:
+        yield row
+    finally:
+        _local.row, _local.timings = previous
+
+
+def add(stage, seconds):
+    row = current()
+    if row is not None and _local.timings:
+        row.add(stage, seconds)
+
+
+def count(name, n=1):
+    row = current()
+    if row is not None:
+        row.count(name, n)
+
+
+@contextmanager
+def timed(stage, exclude=None):
+    """Ajoute la durée du bloc à l'étape `stage`, moins le temps compté dans `exclude` pendant le bloc"""
+    row = current()
+    if row is None or not _local.timings:
+        yield
+        return
+    excluded = row.timings.get(exclude, 0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        row.add(stage, time.perf_counter() - start - (row.timings.get(exclude, 0.0) - excluded))
+
+
+def profiled(func, *args):
+    """Exécute func(*args) en mesurant ses étapes : renvoie (résultat, RowMetrics)
+
+    Fonction de premier niveau, utilisable dans un ProcessPoolExecutor.
+    """
+    row = RowMetrics()
+    with tracking(row):
+        return func(*args), row
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class RunMetrics:
+    """Mesures d'un traitement : une ligne JSONL par ligne traitée et bilan final
+
+    Les durées sont conservées dans des tableaux compacts (8 octets par valeur)
+    pour calculer les percentiles du bilan.
+    """
+
+    def __init__(self, path=None, total=None, progress=False):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8') if path else None
+        self.total = total
+        self.progress = progress
+        self.started = time.perf_counter()
+        self.last_progress = 0.0
+        self.rows = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.durations = {stage: array('d') for stage in STAGES + ('total',)}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def start_row(self, row_num):
+        """Crée les mesures d'une ligne qui entre en traitement"""
+        row = RowMetrics(row_num)
+        with self.lock:
+            self.pending[row_num] = row
+        return row
+
+    def finish_row(self, row_num, status, write_seconds=0.0):
+        """Enregistre une ligne écrite dans le journal"""
+        with self.lock:
+            row = self.pending.pop(row_num, None)
+        if row is None:
+            row = RowMetrics(row_num)
+        row.add('write', write_seconds)
+        total = time.perf_counter() - row.started
+
+        self.rows += 1
+        for stage in STAGES:
+            self.durations[stage].append(row.timings.get(stage, 0.0))
+        self.durations['total'].append(total)
+        for name, n in row.counters.items():
+            self.counters[name] += n
+        if self.file:
+            self.file.write(json.dumps(row.to_record(status, total)) + '\n')
+        if self.progress:
+            self.show_progress()
+
+    def skip_row(self):
+        """Retire du total une ligne recopiée sans traitement (mise à jour incrémentale)"""
+        with self.lock:
+            if self.total:
+                self.total -= 1
+        if self.progress:
+            self.show_progress()
+
+    def show_progress(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        elapsed = now - self.started
+        rate = self.rows / elapsed if elapsed else 0.0
+        line = f"{self.rows}"
+        if self.total:
+            eta = (self.total - self.rows) / rate if rate else 0
+            line += f"/{self.total} lignes ({self.rows / self.total:.0%}), {rate:.1f} lignes/s, reste {format_duration(eta)}"
+        else:
+            line += f" lignes, {rate:.1f} lignes/s"
+        sys.stderr.write(f"\r{line}   ")
+        sys.stderr.flush()
+
+    def summary(self):
+        """Bilan : débit, percentiles par étape, octets, hits cache et déduplication"""
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Mesures : {self.rows} lignes en {format_duration(elapsed)} "
+                 f"({self.rows / elapsed if elapsed else 0:.1f} lignes/s)"]
+        lines.append(f"{'étape':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'cumul':>10}")
+        for stage in STAGES + ('total',):
+            ordered = sorted(self.durations[stage])
+            lines.append(f"{stage:<10} {percentile(ordered, 0.5) * 1000:6.0f}ms {percentile(ordered, 0.95) * 1000:6.0f}ms "
+                         f"{percentile(ordered, 0.99) * 1000:6.0f}ms {sum(ordered):9.1f}s")
+        lines.append(f"{self.counters['requests']} requêtes, {self.counters['bytes'] / 1e6:.1f} Mo transférés, "
+                     f"{self.counters['cache_hits']} hits cache, {self.counters['dedup_hits']} hits déduplication, "
+                     f"{self.counters['unchanged_pages']} fiches inchangées")
+        return '\n'.join(lines)
+
+    def close(self):
+        if self.progress:
+            self.show_progress(force=True)
+            sys.stderr.write('\n')
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+run_metrics = None
+
+
+def enable_metrics(path=None, total=None, progress=False):
+    """Active les mesures du traitement en cours"""
+    global run_metrics
+    run_metrics = RunMetrics(path, total, progress)
+    return run_metrics
+
+
+def disable_metrics():
+    global run_metrics
+    if run_metrics is not None:
+        run_metrics.close()
+    run_metrics = None
@@ -0,0 +1,248 @@
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import dedup
+import html_parser
+import incremental
+import metrics
+from checkpoint import skipped_row, processed_row
+from crawler import analyse_page, crawl_official_site, NO_CONTACTS
+from extraction import is_parcoursup_url, parse_fiche, merge_official_emails
+from fetch_engine import fetch, DEFAULT_MAX_WORKERS
+from preflight import host_checker, split_row
+
+STOP = None
+
+
+class RowTask:
+    """Ligne en cours de traitement dans le pipeline"""
+
+    __slots__ = ('seq', 'row_num', 'cell', 'url', 'target', 'contacts', 'fiche_future', 'official_future', 'metrics', 'fingerprint')
+
+    def __init__(self, seq, row_num, cell, url, fiche_future=None, row_metrics=None):
+        self.seq = seq
+        self.row_num = row_num
+        self.cell = cell                # valeur d'origine de la cellule, écrite dans les résultats
+        self.url = url                  # URL normalisée de la fiche
+        self.target = str(url)          # page à télécharger
+        self.contacts = None            # contacts Parcoursup, une fois la fiche analysée
+        self.fiche_future = fiche_future
+        self.official_future = None
+        self.metrics = row_metrics      # mesures de la ligne (metrics.py), ou None
+        self.fingerprint = None         # empreinte de la fiche (incremental.py), ou None
+
+
+class StagedPipeline:
+    """Pipeline en étages découplant le réseau et le calcul
+
+    - téléchargement : `fetch_workers` threads (fiches, puis exploration des sites officiels)
+    - analyse : `parse_workers` processus (parsing HTML et extraction, hors GIL),
+      y compris pour les pages des sites officiels explorées par crawler.py
+    - écriture : le consommateur de `run()` reçoit les lignes dans l'ordre d'entrée
+
+    Au plus `max_in_flight` lignes circulent en même temps dans le pipeline, ce
+    qui borne toutes les files ; la file vers le pool de processus est en plus
+    limitée à deux tâches par processus.
+
+    Si l'index de déduplication est actif (dedup.enable_dedup), une fiche ou un
+    domaine officiel déjà en cours n'est pas retéléchargé : la ligne attend le
+    résultat de la première occurrence.
+    """
+
+    def __init__(self, fetch_workers=DEFAULT_MAX_WORKERS, parse_workers=None, max_in_flight=None):
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or (self.fetch_workers + self.parse_workers) * 4
+        self.dedup_index = dedup.dedup_index
+        self.run_metrics = metrics.run_metrics
+        self.fingerprints = incremental.fingerprint_store
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.fetch_queue = queue.Queue(self.max_in_flight)
+        self.parse_queue = queue.Queue(self.max_in_flight)
+        self.parsed_queue = queue.Queue(self.parse_workers * 2)
+        self.output_queue = queue.Queue(self.max_in_flight)
+
+    def finish(self, task, contacts):
+        """Envoie la ligne terminée à l'écriture et publie le résultat pour les doublons"""
+        self.output_queue.put((task.seq, processed_row(task.row_num, task.cell, contacts)))
+        if task.fingerprint is not None:
+            self.fingerprints.store(str(task.url), task.fingerprint, contacts)
+        if task.fiche_future is not None:
+            task.fiche_future.set_result(contacts)
+
+    def feed(self, rows):
+        """Étage d'entrée : numérote les lignes et les envoie au téléchargement
+
+        Une erreur de lecture des lignes (classeur, triage, mise à jour
+        incrémentale) est transmise à run(), qui la relève après la dernière
+        ligne déjà engagée.
+        """
+        seq = 0
+        error = None
+        try:
+            for row in rows:
+                row_num, cell, url = split_row(row)
+                self.slots.acquire()
+                if not is_parcoursup_url(url):
+                    self.output_queue.put((seq, skipped_row(row_num, cell)))
+                    seq += 1
+                    continue
+                row_metrics = self.run_metrics.start_row(row_num) if self.run_metrics else None
+                if self.dedup_index is None:
+                    self.fetch_queue.put(RowTask(seq, row_num, cell, url, row_metrics=row_metrics))
+                else:
+                    future, leader = self.dedup_index.claim('fiche', dedup.fiche_key(url))
+                    if leader:
+                        self.fetch_queue.put(RowTask(seq, row_num, cell, url, future, row_metrics))
+                    else:
+                        if row_metrics:
+                            row_metrics.count('dedup_hits')
+                        future.add_done_callback(
+                            lambda f, seq=seq, row_num=row_num, cell=cell:
+                            self.output_queue.put((seq, processed_row(row_num, cell, f.result())))
+                        )
+                seq += 1
+        except Exception as e:
+            error = e
+        finally:
+            self.output_queue.put((STOP, (seq, error)))
+
+    def fetch_stage(self):
+        """Étage réseau : télécharge les fiches brutes et explore les sites officiels"""
+        while True:
+            task = self.fetch_queue.get()
+            if task is STOP:
+                return
+            if task.contacts is not None:
+                try:
+                    with metrics.tracking(task.metrics), metrics.timed('official'):
+                        emails_from_site = crawl_official_site(task.target, parse_page=self.parse_in_pool)
+                except Exception:
+                    emails_from_site = NO_CONTACTS
+                self.official_done(task, emails_from_site)
+                continue
+            try:
+                print(f"Ligne {task.row_num} - Traitement de {task.url}")
+                with metrics.tracking(task.metrics):
+                    response = fetch(task.target, timeout=15)
+                response.raise_for_status()
+                if self.fingerprints:
+                    # Fiche inchangée depuis la dernière analyse : contacts réutilisés
+                    digest = incremental.page_digest(response.content)
+                    contacts = self.fingerprints.lookup(str(task.url), digest)
+                    if contacts:
+                        if task.metrics:
+                            task.metrics.count('unchanged_pages')
+                        self.finish(task, contacts)
+                        continue
+                    task.fingerprint = digest
+                self.parse_queue.put((task, response.text))
+            except Exception as e:
+                print(f'Erreur pour {task.url}: {e}')
+                self.finish(task, ('Erreur', 'Erreur', 'Erreur'))
+
+    def parse_in_pool(self, html, url):
+        """Analyse une page de site officiel dans le pool de processus"""
+        return self.executor.submit(analyse_page, html, url).result()
+
+    def dispatch_stage(self):
+        """Envoie les fiches au pool de processus d'analyse"""
+        while True:
+            item = self.parse_queue.get()
+            if item is STOP:
+                self.parsed_queue.put(STOP)
+                return
+            task, text = item
+            # Les temps de parsing et d'extraction sont mesurés dans le processus d'analyse
+            self.parsed_queue.put((task, self.executor.submit(metrics.profiled, parse_fiche, text)))
+
+    def official_done(self, task, emails_from_site):
+        if task.official_future is not None:
+            task.official_future.set_result(emails_from_site)
+        self.finish(task, merge_official_emails(task.contacts, emails_from_site))
+
+    def request_official_site(self, task, official_site):
+        """Programme l'exploration du site officiel, sauf si son domaine est déjà traité"""
+        if self.dedup_index is not None:
+            future, leader = self.dedup_index.claim('official', dedup.domain_key(official_site))
+            if not leader:
+                if task.metrics:
+                    task.metrics.count('dedup_hits')
+                future.add_done_callback(lambda f: self.finish(task, merge_official_emails(task.contacts, f.result())))
+                return
+            task.official_future = future
+        task.target = official_site
+        self.fetch_queue.put(task)
+
+    def collect_stage(self):
+        """Récupère les résultats d'analyse des fiches et programme les sites officiels"""
+        while True:
+            item = self.parsed_queue.get()
+            if item is STOP:
+                return
+            task, future = item
+            try:
+                (contacts, official_site), parse_metrics = future.result()
+                if task.metrics:
+                    task.metrics.merge(parse_metrics)
+            except Exception as e:
+                print(f'Erreur pour {task.url}: {e}')
+                contacts, official_site = ('Erreur', 'Erreur', 'Erreur'), None
+            task.contacts = contacts
+            if official_site:
+                # Résolution DNS lancée pendant que la ligne attend un thread de téléchargement
+                host_checker.prefetch([urlparse(official_site).hostname or ''])
+                self.request_official_site(task, official_site)
+            else:
+                self.finish(task, contacts)
+
+    def run(self, rows):
+        """Traite les lignes (numéro, URL) et renvoie les lignes de sortie dans l'ordre d'entrée"""
+        self.executor = executor = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            initializer=html_parser.set_parser_backend,
+            initargs=(html_parser.parser_backend,),
+        )
+        fetchers = [threading.Thread(target=self.fetch_stage, daemon=True) for _ in range(self.fetch_workers)]
+        threads = fetchers + [
+            threading.Thread(target=self.feed, args=(rows,), daemon=True),
+            threading.Thread(target=self.dispatch_stage, daemon=True),
+            threading.Thread(target=self.collect_stage, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        total = None
+        error = None
+        try:
+            while total is None or next_seq < total:
+                seq, output_row = self.output_queue.get()
+                if seq is STOP:
+                    total, error = output_row
+                    continue
+                pending[seq] = output_row
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+                    self.slots.release()
+            if error is not None:
+                raise error
+        finally:
+            # Arrêt des étages (les threads sont des démons en cas d'interruption)
+            try:
+                for _ in fetchers:
+                    self.fetch_queue.put_nowait(STOP)
+                self.parse_queue.put_nowait(STOP)
+            except queue.Full:
+                pass
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pipeline(rows, fetch_workers=DEFAULT_MAX_WORKERS, parse_workers=None):
+    """Raccourci : traite les lignes avec un StagedPipeline"""
+    return StagedPipeline(fetch_workers, parse_workers).run(rows)
@@ -0,0 +1,213 @@
+import itertools
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+import fetch_engine
+
+TRIAGE_BATCH = 500           # lignes normalisées et résolues ensemble
+DNS_WORKERS = 16             # résolutions DNS simultanées
+DNS_TIMEOUT = 5              # secondes avant d'abandonner une résolution
+DNS_TTL = 3600               # durée de validité d'une résolution en cache
+
+WHITESPACE_RE = re.compile(r'\s+')
+BARE_HOST_RE = re.compile(r'^[\w-]+(\.[\w-]+)+(:\d+)?(/|$)')
+
+
+def clean_url(value):
+    """Normalise une cellule en URL http(s) (espaces retirés, schéma ajouté, hôte en minuscules), ou None"""
+    text = WHITESPACE_RE.sub('', str(value or ''))
+    if not text:
+        return None
+    if '://' not in text and BARE_HOST_RE.match(text):
+        text = 'https://' + text
+    try:
+        parsed = urlsplit(text)
+        host = parsed.hostname
+        parsed.port  # lève ValueError si le port n'est pas un nombre valide
+        if host:
+            host.encode('idna')
+    except (ValueError, UnicodeError):
+        return None
+    if parsed.scheme.lower() not in ('http', 'https') or not host or ('.' not in host and host != 'localhost'):
+        return None
+    return urlunsplit((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or '/', parsed.query, ''))
+
+
+def _resolve(host):
+    try:
+        socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+        return True
+    except (socket.gaierror, UnicodeError, OSError):
+        return False
+
+
+class HostChecker:
+    """Vérifications préalables aux requêtes : DNS (en cache, par lots) et HEAD
+
+    Un hôte dont le nom ne se résout pas ou qui ne répond pas est inscrit dans
+    le cache négatif de fetch_engine (dead_hosts) : les requêtes suivantes vers
+    cet hôte échouent immédiatement au lieu d'attendre leur délai.
+    """
+
+    def __init__(self, resolve_dns=True, head_check=True, workers=DNS_WORKERS):
+        self.resolve_dns = resolve_dns
+        self.head_check = head_check
+        self.resolved = {}
+        self.inflight = {}
+        self.pages = {}
+        self.rejected = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dns')
+        # Les lots de prefetch attendent leurs résolutions : ils tournent hors du pool de résolution
+        self.coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dns-lots')
+
+    def cached(self, host):
+        with self.lock:
+            entry = self.resolved.get(host)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def submit(self, host):
+        """Résolution de l'hôte, partagée avec une résolution déjà en cours"""
+        with self.lock:
+            future = self.inflight.get(host)
+            if future is not None:
+                return future
+            future = self.executor.submit(_resolve, host)
+            self.inflight[host] = future
+        future.add_done_callback(lambda done: self.forget(host, done))
+        return future
+
+    def forget(self, host, future):
+        with self.lock:
+            if self.inflight.get(host) is future:
+                del self.inflight[host]
+
+    def resolve_many(self, hosts):
+        """Résout en parallèle les hôtes absents du cache ; renvoie {hôte: résolu}
+
+        Seule une résolution qui a réellement échoué ou dépassé son délai compte
+        comme un échec : un hôte dont la résolution attendait encore son tour
+        dans le pool au moment du délai est considéré comme joignable (la requête
+        elle-même tranchera) et n'est pas mis en cache.
+        """
+        results = {}
+        if not self.resolve_dns:
+            return dict.fromkeys(hosts, True)
+        futures = {}
+        for host in set(hosts):
+            known = self.cached(host)
+            if known is None:
+                futures[host] = self.submit(host)
+            else:
+                results[host] = known
+        deadline = time.monotonic() + DNS_TIMEOUT
+        for host, future in futures.items():
+            try:
+                ok = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except TimeoutError:
+                if future.done():
+                    ok = future.result()
+                elif not future.running():
+                    # Encore en file d'attente : pas un échec DNS
+                    results[host] = True
+                    continue
+                else:
+                    ok = False
+            with self.lock:
+                self.resolved[host] = (ok, time.monotonic() + DNS_TTL)
+            if not ok:
+                fetch_engine.dead_hosts.mark_dead(host)
+            results[host] = ok
+        return results
+
+    def prefetch(self, hosts):
+        """Lance la résolution des hôtes sans attendre (sites officiels découverts dans les fiches)"""
+        if self.resolve_dns:
+            hosts = [host for host in hosts if self.cached(host) is None]
+            if hosts:
+                self.coordinator.submit(self.resolve_many, hosts)
+
+    def reject(self, reason):
+        with self.lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return reason
+
+    def check_page(self, url):
+        """Raison de ne pas explorer la page (hôte injoignable, DNS, page absente ou non HTML), ou None"""
+        host = urlsplit(url).hostname or ''
+        if fetch_engine.dead_hosts.is_dead(host):
+            return self.reject('hôte injoignable')
+        if not self.resolve_many([host])[host]:
+            return self.reject('DNS en échec')
+        if not self.head_check:
+            return None
+        with self.lock:
+            if url in self.pages:
+                return self.pages[url]
+        try:
+            response = fetch_engine.head(url, timeout=10)
+            content_type = response.headers.get('Content-Type', 'text/html')
+            if response.status_code in (404, 410):
+                reason = 'page introuvable'
+            elif response.status_code < 400 and 'html' not in content_type:
+                reason = 'pas une page HTML'
+            else:
+                reason = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if fetch_engine.is_unreachable(e):
+                fetch_engine.dead_hosts.mark_dead(host)
+                reason = 'hôte injoignable'
+            else:
+                # Serveur lent : l'exploration décidera, avec son propre délai
+                reason = None
+        except requests.RequestException:
+            # Réponse inexploitable (redirections en boucle...) : l'exploration décidera
+            reason = None
+        with self.lock:
+            self.pages[url] = reason
+        return reason and self.reject(reason)
+
+    def report(self):
+        with self.lock:
+            failed = sum(1 for ok, _ in self.resolved.values() if not ok)
+            details = ', '.join(f'{reason} : {count}' for reason, count in sorted(self.rejected.items()))
+        return (f"Vérifications préalables : {len(self.resolved)} hôtes résolus ({failed} en échec), "
+                f"sites officiels écartés : {details or 'aucun'}")
+
+
+host_checker = HostChecker()
+
+
+def triage(rows, batch_size=TRIAGE_BATCH):
+    """Étage préalable : normalise les URLs par lots et résout les hôtes des fiches
+
+    Renvoie les lignes (numéro, cellule d'origine, URL normalisée) : la cellule
+    d'origine est écrite dans les résultats et comparée aux résultats précédents,
+    l'URL normalisée sert au téléchargement. Une cellule qui n'est pas une URL
+    valide est transmise telle quelle et sera ignorée (Skipped) au traitement.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        cleaned = [(row_num, clean_url(value), value) for row_num, value in batch]
+        host_checker.resolve_many(urlsplit(url).hostname for _, url, _ in cleaned if url)
+        for row_num, url, value in cleaned:
+            yield row_num, value, url or value
+
+
+def split_row(row):
+    """(numéro, cellule d'origine, URL à télécharger) d'une ligne triée ou d'une ligne brute (numéro, URL)"""
+    if len(row) == 3:
+        return row
+    row_num, value = row
+    return row_num, value, value
@@ -0,0 +1,227 @@
+import argparse
+import functools
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+
+import fetch_engine
+import preflight
+from adaptive import THROTTLE_STATUSES
+from extraction import is_parcoursup_url
+from http_cache import normalize_url
+from http_session import configure_session, get_session
+from stub_server import start_corpus_server
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'corpus')
+GOLDEN_FILE = 'golden.json'
+
+# En-têtes conservés avec chaque réponse enregistrée
+RECORDED_HEADERS = ('Content-Type', 'Location', 'Retry-After')
+
+# Débit autorisé en rejeu : le serveur local remplace tous les hôtes
+REPLAY_RATE_LIMIT = (1000.0, 100)
+
+
+class Corpus:
+    """Réponses HTTP enregistrées : index.json (URL normalisée -> statut, en-têtes, fichier) et corps bruts"""
+
+    def __init__(self, directory=DEFAULT_CORPUS_DIR):
+        self.directory = directory
+        self.index = {}
+        path = os.path.join(directory, 'index.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def lookup(self, url):
+        return self.index.get(normalize_url(url))
+
+    def body(self, entry):
+        if not entry.get('file'):
+            return b''
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            return f.read()
+
+    def add(self, url, status, headers, content):
+        """Ajoute (ou remplace) la réponse enregistrée pour une URL"""
+        key = normalize_url(url)
+        entry = {'url': url, 'status': status, 'headers': headers}
+        if content:
+            extension = '.html' if 'html' in headers.get('Content-Type', 'text/html') else '.txt'
+            entry['file'] = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + extension
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, entry['file']), 'wb') as f:
+                f.write(content)
+        self.index[key] = entry
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.index.items())), f, ensure_ascii=False, indent=1)
+
+    def fiche_urls(self):
+        """URLs des fiches Parcoursup enregistrées (y compris celles en erreur)"""
+        return sorted(entry['url'] for entry in self.index.values()
+                      if is_parcoursup_url(entry['url']) and not entry['url'].endswith('/robots.txt'))
+
+
+class Recorder:
+    """Hook de réponse de la session partagée : enregistre chaque réponse dans le corpus"""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.lock = threading.Lock()
+
+    def __call__(self, response, *args, **kwargs):
+        status = response.status_code
+        if status < 500 and status not in THROTTLE_STATUSES:
+            headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+            with self.lock:
+                self.corpus.add(response.url, status, headers, response.content)
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Envoie toutes les requêtes au serveur local du corpus en encodant l'URL d'origine dans le chemin
+
+    La réponse garde l'URL d'origine : liens relatifs, domaines et limites par hôte
+    se comportent comme sur le site réel.
+    """
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        original = request.url
+        scheme, rest = original.split('://', 1)
+        request.url = f'{self.base_url}/{scheme}/{rest}'
+        try:
+            response = super().send(request, **kwargs)
+        finally:
+            request.url = original
+        response.url = original
+        return response
+
+
+_saved_rate_limiter = None
+
+
+def enable_replay(base_url):
+    """Redirige la session partagée vers le serveur de rejeu et lève les limites de débit
+
+    Les hôtes enregistrés n'existent pas forcément dans le DNS local : la résolution est désactivée.
+    """
+    global _saved_rate_limiter
+    configure_session(adapter_class=functools.partial(ReplayAdapter, base_url))
+    preflight.host_checker.resolve_dns = False
+    if _saved_rate_limiter is None:
+        _saved_rate_limiter = fetch_engine.rate_limiter
+        fetch_engine.rate_limiter = fetch_engine.HostRateLimiter(limits={}, default=REPLAY_RATE_LIMIT)
+
+
+def disable_replay():
+    global _saved_rate_limiter
+    configure_session(adapter_class=HTTPAdapter)
+    preflight.host_checker.resolve_dns = True
+    if _saved_rate_limiter is not None:
+        fetch_engine.rate_limiter = _saved_rate_limiter
+        _saved_rate_limiter = None
+
+
+@contextmanager
+def replaying(corpus, **server_options):
+    """Rejoue le corpus le temps du bloc ; options : latency, error_rate, error_kinds, seed"""
+    server, base_url = start_corpus_server(corpus, **server_options)
+    enable_replay(base_url)
+    try:
+        yield server
+    finally:
+        disable_replay()
+        server.shutdown()
+
+
+def record(input_file, url_column='O', start_row=2, limit=50, corpus_dir=DEFAULT_CORPUS_DIR, max_workers=4):
+    """Traite les `limit` premières lignes sur le site réel en enregistrant toutes les réponses"""
+    from scraper_bulk import iter_url_column, process_row
+
+    corpus = Corpus(corpus_dir)
+    recorder = Recorder(corpus)
+    session = get_session()
+    session.hooks['response'].append(recorder)
+    try:
+        _, rows = iter_url_column(input_file, url_column, start_row)
+        for _ in fetch_engine.map_ordered(process_row, itertools.islice(rows, limit), max_workers):
+            pass
+    finally:
+        session.hooks['response'].remove(recorder)
+        corpus.save()
+    print(f"{len(corpus.index)} réponses enregistrées dans {corpus_dir} ({len(corpus.fiche_urls())} fiches)")
+    return corpus
+
+
+def replay_contacts(corpus, max_workers=8, **server_options):
+    """Rejoue extract_contacts_from_url sur toutes les fiches du corpus : {URL: [général, pédagogique, administratif]}"""
+    from scraper_bulk import extract_contacts_from_url
+
+    urls = corpus.fiche_urls()
+    with replaying(corpus, **server_options):
+        results = fetch_engine.map_ordered(extract_contacts_from_url, urls, max_workers)
+        return {url: list(contacts) for url, contacts in zip(urls, results)}
+
+
+def update_golden(corpus):
+    """Enregistre les résultats actuels comme résultats de référence"""
+    golden = replay_contacts(corpus)
+    with open(os.path.join(corpus.directory, GOLDEN_FILE), 'w', encoding='utf-8') as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1)
+    print(f"Résultats de référence mis à jour : {len(golden)} fiches")
+
+
+def check_golden(corpus, **server_options):
+    """Compare les résultats rejoués aux résultats de référence ; renvoie la liste des écarts"""
+    with open(os.path.join(corpus.directory, GOLDEN_FILE), encoding='utf-8') as f:
+        golden = json.load(f)
+    results = replay_contacts(corpus, **server_options)
+    differences = []
+    for url in sorted(set(golden) | set(results)):
+        if golden.get(url) != results.get(url):
+            differences.append((url, golden.get(url), results.get(url)))
+    return differences
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Enregistrement et rejeu hors ligne des pages Parcoursup")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS_DIR, help="dossier du corpus")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="enregistrer les pages visitées pour les premières lignes d'un fichier")
+    record_parser.add_argument('input_file')
+    record_parser.add_argument('--column', default='O', help="colonne des URLs")
+    record_parser.add_argument('--start-row', type=int, default=2)
+    record_parser.add_argument('--limit', type=int, default=50, help="nombre de lignes à enregistrer")
+
+    commands.add_parser('golden', help="mettre à jour les résultats de référence à partir du corpus")
+
+    check_parser = commands.add_parser('check', help="vérifier l'extraction contre les résultats de référence")
+    check_parser.add_argument('--latency', type=float, default=0.0)
+    check_parser.add_argument('--error-rate', type=float, default=0.0, help="fraction de réponses en erreur (500, 503, connexion coupée)")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        corpus = record(args.input_file, args.column, args.start_row, args.limit, args.corpus)
+        update_golden(corpus)
+    elif args.command == 'golden':
+        update_golden(Corpus(args.corpus))
+    else:
+        differences = check_golden(Corpus(args.corpus), latency=args.latency, error_rate=args.error_rate)
+        for url, expected, found in differences:
+            print(f"ÉCART {url}\n  attendu : {expected}\n  obtenu  : {found}")
+        print(f"{len(differences)} écart(s) par rapport aux résultats de référence")
+        sys.exit(1 if differences else 0)
@@ -0,0 +1,253 @@
+import datetime
+import glob
+import json
+from array import array
+from collections import Counter
+
+RESULTS_EXTENSION = '.results'
+FORMAT_VERSION = 1
+
+# Statuts codés sur un octet ; le texte d'une erreur (ou d'un statut inconnu) est stocké à part
+PROCESSED = 0
+SKIPPED = 1
+ERROR = 2
+OTHER = 3
+STATUS_LABELS = ('Traité', 'Skipped', 'Erreur', 'Autre')
+
+# Valeurs de remplissage des colonnes de contact, toujours aux mêmes indices
+NOT_FOUND = 0
+FAILED = 1
+INVALID_URL = 2
+PLACEHOLDERS = ('Non trouvé', 'Erreur', 'URL invalide')
+
+CONTACT_COLUMNS = ('general', 'pedagogical', 'admin')
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def default_results_file(output_file):
+    """Chemin de la base de résultats associée à un fichier de sortie"""
+    return output_file.rsplit('.', 1)[0] + RESULTS_EXTENSION
+
+
+def latest_results_file(pattern='contacts_extraits_*'):
+    """Base de résultats la plus récente du dossier courant, ou None"""
+    files = glob.glob(pattern + RESULTS_EXTENSION)
+    return max(files) if files else None
+
+
+class StringTable:
+    """Chaînes internées : chaque valeur distincte n'est stockée qu'une fois et référencée par son indice"""
+
+    __slots__ = ('values', 'indexes')
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.indexes = {value: index for index, value in enumerate(self.values)}
+
+    def intern(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self.indexes[value] = index
+        return index
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ResultRecord:
+    """Une ligne de résultats, reconstituée à la demande depuis les colonnes"""
+
+    __slots__ = ('row', 'url', 'general', 'pedagogical', 'admin', 'status', 'timestamp')
+
+    def __init__(self, row, url, general, pedagogical, admin, status, timestamp):
+        self.row = row
+        self.url = url
+        self.general = general
+        self.pedagogical = pedagogical
+        self.admin = admin
+        self.status = status
+        self.timestamp = timestamp
+
+    def to_record(self):
+        """Enregistrement au format du journal (checkpoint.row_to_record)"""
+        return {
+            'row': self.row,
+            'url': self.url,
+            'general': self.general,
+            'pedagogical': self.pedagogical,
+            'admin': self.admin,
+            'status': self.status,
+            'timestamp': self.timestamp.isoformat(),
+        }
+
+
+class ResultStore:
+    """Résultats d'un traitement stockés en colonnes compactes
+
+    Numéros de ligne, statuts (un octet) et horodatages (microsecondes) sont
+    des tableaux typés ; URLs, e-mails et textes d'erreur sont internés (une
+    fiche ou un e-mail répété sur mille lignes n'est stocké qu'une fois) et les
+    domaines des e-mails le sont à leur tour. Les comptages de check_results
+    sont des agrégats sur ces colonnes ; Excel et CSV ne sont que des exports.
+    """
+
+    def __init__(self):
+        self.rows = array('I')
+        self.url_ids = array('I')
+        self.contacts = {column: array('I') for column in CONTACT_COLUMNS}
+        self.statuses = array('B')
+        self.text_ids = array('I')
+        self.timestamps = array('q')
+        self.urls = StringTable()
+        self.values = StringTable(PLACEHOLDERS)
+        self.texts = StringTable([''])
+        self.domains = StringTable([''])
+        self.value_domains = array('I', [0] * len(PLACEHOLDERS))
+
+    @classmethod
+    def from_records(cls, records):
+        """Construit la base à partir d'enregistrements du journal (déjà dans l'ordre des lignes)"""
+        store = cls()
+        for record in records:
+            store.append(record)
+        return store
+
+    def intern_value(self, value):
+        count = len(self.values)
+        index = self.values.intern(value)
+        if index == count:
+            domain = value.rpartition('@')[2].lower() if '@' in value else ''
+            self.value_domains.append(self.domains.intern(domain))
+        return index
+
+    def append(self, record):
+        """Ajoute un enregistrement au format du journal"""
+        status = record['status']
+        if status == 'Traité':
+            code, text = PROCESSED, 0
+        elif status == 'Skipped':
+            code, text = SKIPPED, 0
+        else:
+            code = ERROR if 'Erreur' in status else OTHER
+            text = self.texts.intern(status)
+        self.rows.append(record['row'])
+        self.url_ids.append(self.urls.intern(record['url']))
+        for column in CONTACT_COLUMNS:
+            self.contacts[column].append(self.intern_value(str(record[column])))
+        self.statuses.append(code)
+        self.text_ids.append(text)
+        timestamp = datetime.datetime.fromisoformat(record['timestamp'])
+        self.timestamps.append((timestamp - EPOCH) // MICROSECOND)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record(self, i):
+        code = self.statuses[i]
+        status = self.texts.values[self.text_ids[i]] if code >= ERROR else STATUS_LABELS[code]
+        values = self.values.values
+        return ResultRecord(
+            self.rows[i],
+            self.urls.values[self.url_ids[i]],
+            values[self.contacts['general'][i]],
+            values[self.contacts['pedagogical'][i]],
+            values[self.contacts['admin'][i]],
+            status,
+            EPOCH + self.timestamps[i] * MICROSECOND,
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def records(self):
+        """Enregistrements au format du journal, pour les exports"""
+        for result in self:
+            yield result.to_record()
+
+    # Agrégats
+
+    def status_counts(self):
+        """{libellé du statut: nombre de lignes}"""
+        codes = self.statuses.tobytes()
+        return {label: codes.count(code) for code, label in enumerate(STATUS_LABELS)}
+
+    def rows_with_emails(self):
+        """Lignes traitées avec au moins un e-mail pédagogique ou administratif (valeurs de remplissage exclues)"""
+        pedagogical, admin = self.contacts['pedagogical'], self.contacts['admin']
+        first_email = len(PLACEHOLDERS)
+        return sum(1 for code, p, a in zip(self.statuses, pedagogical, admin)
+                   if code == PROCESSED and (p >= first_email or a >= first_email))
+
+    def found_counts(self):
+        """{colonne de contact: nombre de lignes traitées où un e-mail a été trouvé}"""
+        return {column: sum(1 for code, value in zip(self.statuses, self.contacts[column])
+                            if code == PROCESSED and value >= len(PLACEHOLDERS))
+                for column in CONTACT_COLUMNS}
+
+    def top_domains(self, n=10):
+        """Domaines d'e-mails les plus fréquents (toutes colonnes de contact confondues)"""
+        counts = Counter()
+        for column in CONTACT_COLUMNS:
+            counts.update(self.contacts[column])
+        domains = Counter()
+        for value, count in counts.items():
+            domain = self.value_domains[value]
+            if domain:
+                domains[self.domains.values[domain]] += count
+        return domains.most_common(n)
+
+    # Fichier
+
+    def columns(self):
+        return [('rows', self.rows), ('url_ids', self.url_ids)] + \
+               [(column, self.contacts[column]) for column in CONTACT_COLUMNS] + \
+               [('statuses', self.statuses), ('text_ids', self.text_ids), ('timestamps', self.timestamps)]
+
+    def save(self, path):
+        """Écrit la base : une ligne d'en-tête JSON (tables de chaînes) puis les colonnes brutes"""
+        header = {
+            'version': FORMAT_VERSION,
+            'rows': len(self),
+            'urls': self.urls.values,
+            'values': self.values.values[len(PLACEHOLDERS):],
+            'texts': self.texts.values[1:],
+            'columns': [(name, column.typecode, column.itemsize) for name, column in self.columns()],
+        }
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for _, column in self.columns():
+                column.tofile(f)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != FORMAT_VERSION:
+                raise ValueError(f"{path} : version de format {header.get('version')} non prise en charge")
+            store.urls = StringTable(header['urls'])
+            for value in header['values']:
+                store.intern_value(value)
+            store.texts = StringTable([''] + header['texts'])
+            for (name, column), (_, typecode, itemsize) in zip(store.columns(), header['columns']):
+                if column.typecode != typecode or column.itemsize != itemsize:
+                    raise ValueError(f"{path} : colonne {name} incompatible ({typecode}, {itemsize} octets)")
+                column.fromfile(f, header['rows'])
+        return store
+
+    def export(self, output_file):
+        """Exporte les résultats en Excel (write_only) ou en CSV selon l'extension"""
+        # Import à la demande : lire la base et calculer ses agrégats ne charge pas openpyxl
+        from checkpoint import write_csv, write_excel
+
+        if output_file.endswith('.csv'):
+            write_csv(self.records(), output_file)
+        else:
+            write_excel(self.records(), output_file)
+        return output_file
@@ -1,12 +1,10 @@
+import sys
+
 import requests
-from bs4 import BeautifulSoup
-import openpyxl
-import re
 
-def extract_emails_from_text(text):
-    """Extrait tous les e-mails d'un texte"""
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.findall(email_pattern, text)
+from extraction import extract_emails_from_text, extract_contacts_from_soup
+from html_parser import parse_html
+from fetch_engine import fetch
 
 def get_official_website_from_parcoursup(soup):
     """Extrait le site officiel de l'établissement depuis la page Parcoursup"""
@@ -22,9 +20,9 @@ def get_official_website_from_parcoursup(soup):
 def scrape_official_website(url):
     """Scrape le site officiel pour trouver des e-mails de contact"""
     try:
-        response = requests.get(url, timeout=10)
+        response = fetch(url, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_html(response.text)
         
         # Extraire tout le texte de la page et chercher des e-mails
         page_text = soup.get_text()
@@ -35,58 +33,16 @@ def scrape_official_website(url):
         return []
 
 def scrape_and_update_excel(url, excel_file, sheet_name):
+    import openpyxl
+
     try:
         print(f"Traitement du lien : {url}")
-        response = requests.get(url, timeout=10)
+        response = fetch(url, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Chercher la section "Contacter et échanger avec l'établissement"
-        contact_section = soup.find('h3', string=lambda text: text and 'Contacter et échanger' in text)
+        soup = parse_html(response.text)
         
-        if not contact_section:
-            # Essayer une recherche plus large
-            contact_section = soup.find(string=lambda text: text and 'Contacter et échanger' in text)
-        
-        pedagogical_email = 'Non trouvé'
-        admin_email = 'Non trouvé'
-        general_contact = 'Non trouvé'
-        
-        if contact_section:
-            # Trouver le conteneur parent de la section de contact
-            parent_section = contact_section.find_parent() if hasattr(contact_section, 'find_parent') else contact_section.parent
-            
-            # Chercher dans plusieurs niveaux de parents pour trouver la section complète
-            for _ in range(5):  # Essayer jusqu'à 5 niveaux de parents
-                if parent_section:
-                    section_text = parent_section.get_text() if hasattr(parent_section, 'get_text') else str(parent_section)
-                    emails = extract_emails_from_text(section_text)
-                    
-                    if emails:
-                        # Assigner les e-mails en fonction de leur contexte
-                        for email in emails:
-                            email_context = section_text.lower()
-                            if 'pédagogique' in email_context or 'pedagogique' in email_context:
-                                pedagogical_email = email
-                            elif 'administratif' in email_context or 'administration' in email_context:
-                                admin_email = email
-                            elif general_contact == 'Non trouvé':
-                                general_contact = email
-                        
-                        # Si on a trouvé des e-mails, assigner intelligemment
-                        if len(emails) >= 2:
-                            if pedagogical_email == 'Non trouvé':
-                                pedagogical_email = emails[0]
-                            if admin_email == 'Non trouvé':
-                                admin_email = emails[1] if len(emails) > 1 else emails[0]
-                        elif len(emails) == 1:
-                            if pedagogical_email == 'Non trouvé':
-                                pedagogical_email = emails[0]
-                        break
-                    
-                    parent_section = parent_section.find_parent() if hasattr(parent_section, 'find_parent') else getattr(parent_section, 'parent', None)
-                else:
-                    break
+        # Chercher les e-mails de la section "Contacter et échanger avec l'établissement"
+        general_contact, pedagogical_email, admin_email = extract_contacts_from_soup(soup)
         
         # Si aucun e-mail trouvé, essayer de chercher le site officiel
         if pedagogical_email == 'Non trouvé' and admin_email == 'Non trouvé':
@@ -144,10 +100,6 @@ def scrape_and_update_excel(url, excel_file, sheet_name):
         print(f'Erreur générale pour {url}: {e}')
 
 if __name__ == '__main__':
-    liens = [
-        'https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod=43102&typeBac=0&originePc=0',
-        'https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod=43064&typeBac=0&originePc=0',
-        'https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod=43066&typeBac=0&originePc=0'
-    ]
-    for lien in liens:
-        scrape_and_update_excel(lien, '20250117_cartographie_for.xlsx', 'Sheet1') 
\ No newline at end of file
+    # URLs passées en arguments, classeur et réglages lus dans le profil (voir cli.py et profils.ini)
+    import cli
+    cli.main(['fiches'] + sys.argv[1:])
@@ -1,192 +1,273 @@
-import requests
-from bs4 import BeautifulSoup
+import sys
 import openpyxl
-import re
-import time
+from openpyxl.utils import column_index_from_string
 import datetime
-from urllib.parse import urlparse
-
-def extract_emails_from_text(text):
-    """Extrait tous les e-mails d'un texte"""
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.findall(email_pattern, text)
+import time
+from collections import deque
 
-def get_official_website_from_parcoursup(soup):
-    """Extrait le site officiel de l'établissement depuis la page Parcoursup"""
-    try:
-        website_links = soup.find_all('a', href=True)
-        for link in website_links:
-            href = link['href']
-            if 'http' in href and 'parcoursup' not in href and 'gouv.fr' not in href:
-                return href
-    except:
-        pass
-    return None
+from extraction import is_parcoursup_url, parse_fiche, merge_official_emails
+from crawler import crawl_official_site, NO_CONTACTS
+import fetch_engine
+from fetch_engine import fetch, map_ordered, DEFAULT_MAX_WORKERS
+from http_session import SESSION_CONFIG, configure_session
+from http_cache import DEFAULT_CACHE_FILE, DEFAULT_TTL, enable_cache, disable_cache
+import dedup
+import incremental
+import metrics
+import preflight
+from pipeline import run_pipeline
+from checkpoint import RunJournal, default_journal_file, skipped_row, processed_row, failed_row
+from metrics import default_metrics_file, enable_metrics, disable_metrics
+from result_store import ResultStore, default_results_file
+from incremental import Baseline, page_digest, enable_fingerprints, disable_fingerprints, DEFAULT_FINGERPRINT_FILE
 
 def scrape_official_website(url):
-    """Scrape le site officiel pour trouver des e-mails de contact"""
+    """Explore le site officiel (accueil et pages de contact) : (e-mail pédagogique, e-mail administratif)"""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        page_text = soup.get_text()
-        emails = extract_emails_from_text(page_text)
-        
-        return emails[:3] if emails else []
+        return crawl_official_site(url)
     except:
-        return []
+        return NO_CONTACTS
 
 def extract_contacts_from_url(url):
     """Extrait les contacts d'une URL Parcoursup"""
     try:
-        response = requests.get(url, timeout=15)
+        response = fetch(url, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Chercher la section "Contacter et échanger avec l'établissement"
-        contact_section = soup.find('h3', string=lambda text: text and 'Contacter et échanger' in text)
         
-        if not contact_section:
-            contact_section = soup.find(string=lambda text: text and 'Contacter et échanger' in text)
+        # Fiche inchangée depuis la dernière analyse : contacts réutilisés
+        fingerprints = incremental.fingerprint_store
+        if fingerprints:
+            digest = page_digest(response.content)
+            contacts = fingerprints.lookup(url, digest)
+            if contacts:
+                metrics.count('unchanged_pages')
+                return contacts
         
-        pedagogical_email = 'Non trouvé'
-        admin_email = 'Non trouvé'
-        general_contact = 'Non trouvé'
+        # Chercher les e-mails de la section "Contacter et échanger avec l'établissement"
+        contacts, official_site = parse_fiche(response.text)
         
-        if contact_section:
-            parent_section = contact_section.find_parent() if hasattr(contact_section, 'find_parent') else contact_section.parent
-            
-            for _ in range(5):
-                if parent_section:
-                    section_text = parent_section.get_text() if hasattr(parent_section, 'get_text') else str(parent_section)
-                    emails = extract_emails_from_text(section_text)
-                    
-                    if emails:
-                        for email in emails:
-                            email_context = section_text.lower()
-                            if 'pédagogique' in email_context or 'pedagogique' in email_context:
-                                pedagogical_email = email
-                            elif 'administratif' in email_context or 'administration' in email_context:
-                                admin_email = email
-                            elif general_contact == 'Non trouvé':
-                                general_contact = email
-                        
-                        if len(emails) >= 2:
-                            if pedagogical_email == 'Non trouvé':
-                                pedagogical_email = emails[0]
-                            if admin_email == 'Non trouvé':
-                                admin_email = emails[1] if len(emails) > 1 else emails[0]
-                        elif len(emails) == 1:
-                            if pedagogical_email == 'Non trouvé':
-                                pedagogical_email = emails[0]
-                        break
-                    
-                    parent_section = parent_section.find_parent() if hasattr(parent_section, 'find_parent') else getattr(parent_section, 'parent', None)
+        # Si aucun e-mail trouvé, essayer le site officiel (une seule fois par domaine)
+        if official_site:
+            with metrics.timed('official'):
+                if dedup.dedup_index:
+                    emails_from_site = dedup.dedup_index.once('official', dedup.domain_key(official_site), lambda: scrape_official_website(official_site))
                 else:
-                    break
-        
-        # Si aucun e-mail trouvé, essayer le site officiel
-        if pedagogical_email == 'Non trouvé' and admin_email == 'Non trouvé':
-            official_site = get_official_website_from_parcoursup(soup)
-            if official_site:
-                emails_from_site = scrape_official_website(official_site)
-                if emails_from_site:
-                    pedagogical_email = emails_from_site[0] if len(emails_from_site) > 0 else 'Non trouvé'
-                    admin_email = emails_from_site[1] if len(emails_from_site) > 1 else pedagogical_email
+                    emails_from_site = scrape_official_website(official_site)
+            contacts = merge_official_emails(contacts, emails_from_site)
         
-        return general_contact, pedagogical_email, admin_email
+        if fingerprints:
+            fingerprints.store(url, digest, contacts)
+        return contacts
         
     except Exception as e:
         print(f'Erreur pour {url}: {e}')
         return 'Erreur', 'Erreur', 'Erreur'
 
-def process_excel_bulk(input_file, url_column='D', start_row=2):
-    """Traite en masse un fichier Excel avec des URLs Parcoursup"""
+def process_row(row):
+    """Traite une ligne (numéro, cellule, URL normalisée) ou (numéro, URL) et renvoie la ligne de sortie"""
+    row_num, value, url = preflight.split_row(row)
+    
+    if not is_parcoursup_url(url):
+        return skipped_row(row_num, value)
+    
+    row_metrics = metrics.run_metrics.start_row(row_num) if metrics.run_metrics else None
+    with metrics.tracking(row_metrics):
+        try:
+            print(f"Ligne {row_num} - Traitement de {url}")
+            if dedup.dedup_index:
+                # Une fiche déjà vue dans ce traitement n'est pas retéléchargée
+                contacts = dedup.dedup_index.once('fiche', dedup.fiche_key(url), lambda: extract_contacts_from_url(str(url)))
+            else:
+                contacts = extract_contacts_from_url(str(url))
+            return processed_row(row_num, value, contacts)
+        except Exception as e:
+            print(f"Erreur ligne {row_num}: {e}")
+            return failed_row(row_num, value, e)
+
+def iter_url_column(input_file, url_column, start_row):
+    """Lit en flux (read_only) la colonne des URLs et renvoie (nombre de lignes, générateur de (ligne, URL))"""
+    wb_input = openpyxl.load_workbook(input_file, read_only=True)
+    sheet_input = wb_input.active
+    col_idx = column_index_from_string(url_column)
+    
+    def rows():
+        try:
+            cells = sheet_input.iter_rows(min_row=start_row, min_col=col_idx, max_col=col_idx, values_only=True)
+            for row_num, (value,) in enumerate(cells, start=start_row):
+                yield row_num, value or ''
+        finally:
+            wb_input.close()
+    
+    return sheet_input.max_row, rows()
+
+def keep_unchanged_rows(rows, previous, kept_rows):
+    """Ne laisse passer que les lignes à retraiter ; les autres sont placées dans kept_rows"""
+    now = datetime.datetime.now()
+    for row in rows:
+        # Comparaison sur la cellule d'origine, telle qu'écrite dans les résultats précédents
+        if previous.reason_to_process(row[0], row[1], now) is None:
+            kept_rows.append(previous.previous_row(row[0]))
+        else:
+            yield row
+
+def process_excel_bulk(input_file, url_column='D', start_row=2, max_workers=DEFAULT_MAX_WORKERS, cache_file=DEFAULT_CACHE_FILE, resume=False, journal_file=None, output_format='xlsx', parse_workers=0, deduplicate=True, metrics_file=None, progress=False, baseline=None, refresh_after=None, fingerprint_file=DEFAULT_FINGERPRINT_FILE, shard=None):
+    """Traite en masse un fichier Excel avec des URLs Parcoursup
+
+    Les pages téléchargées sont conservées dans le cache disque `cache_file`
+    (None pour désactiver) : une relance ne retélécharge que les pages expirées.
+
+    Chaque ligne traitée est consignée dans un journal JSONL (`journal_file`,
+    par défaut à côté du fichier d'entrée). Avec `resume=True`, les lignes déjà
+    terminées sont sautées et seules les lignes en erreur ou restantes sont traitées.
+    En fin de traitement, le journal est converti en base de résultats compacte
+    (`.results`, voir result_store.py), exportée vers le fichier de sortie
+    (`output_format` : 'xlsx' ou 'csv') ; l'entrée est lue en mode read_only.
+
+    Avec `parse_workers` > 0, le parsing et l'extraction tournent dans un pool
+    de processus séparé des threads de téléchargement (voir pipeline.py).
+
+    Avec `deduplicate=True`, chaque fiche (URL normalisée) et chaque domaine de
+    site officiel n'est traité qu'une fois ; le résultat est recopié sur toutes
+    les lignes qui y font référence.
+
+    Les temps par étape et les compteurs de chaque ligne sont écrits dans
+    `metrics_file` (JSONL, par défaut à côté du fichier d'entrée) et résumés
+    en fin de traitement ; `progress=True` affiche une ligne de progression
+    avec estimation du temps restant.
+
+    Avec `baseline` (fichier de résultats ou journal d'un traitement précédent),
+    seules les lignes nouvelles, dont l'URL a changé, en erreur ou dont le
+    résultat a plus de `refresh_after` jours sont retraitées ; les autres sont
+    recopiées telles quelles. Les empreintes des fiches (`fingerprint_file`,
+    enregistrées à chaque traitement) évitent alors de réanalyser une fiche
+    dont le contenu n'a pas changé.
+
+    Avec `shard` (shards.Shard), seules les lignes de ce shard sont traitées :
+    c'est ainsi que chaque processus de travail traite sa part du fichier (voir
+    shards.py). `output_format=None` n'écrit que le journal, sans fichier de sortie.
+    Une erreur générale ou une interruption est alors propagée à l'appelant au
+    lieu d'être seulement affichée, pour que le shard soit repris.
+    """
     
     # Créer un fichier de sortie avec timestamp
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"contacts_extraits_{timestamp}.xlsx"
+    output_file = f"contacts_extraits_{timestamp}.{output_format}"
+    
+    # Une connexion keep-alive par worker vers Parcoursup
+    if max_workers > SESSION_CONFIG['pool_maxsize']:
+        configure_session(pool_maxsize=max_workers)
+    
+    max_age = datetime.timedelta(days=refresh_after) if refresh_after else None
+    # Une ligne à rafraîchir ne doit pas être servie par le cache sans revalidation
+    ttl = min(DEFAULT_TTL, max_age.total_seconds()) if max_age else DEFAULT_TTL
+    cache = enable_cache(cache_file, ttl) if cache_file else None
+    # Empreintes toujours enregistrées, réutilisées seulement en mise à jour incrémentale
+    fingerprints = enable_fingerprints(fingerprint_file, reuse=bool(baseline)) if fingerprint_file else None
+    dedup_index = dedup.enable_dedup() if deduplicate else None
+    journal = None
+    run_metrics = None
+    previous = None
+    processed_count = 0
+    error_count = 0
     
     try:
-        # Ouvrir le fichier d'entrée
-        wb_input = openpyxl.load_workbook(input_file)
-        sheet_input = wb_input.active
+        # Ouvrir le fichier d'entrée en lecture seule (flux)
+        max_row, input_rows = iter_url_column(input_file, url_column, start_row)
         
-        # Créer le fichier de sortie
-        wb_output = openpyxl.Workbook()
-        sheet_output = wb_output.active
+        # Résultats précédents chargés avant l'ouverture du journal, qui peut être le même fichier
+        previous = Baseline(baseline, max_age) if baseline else None
+        journal = RunJournal(journal_file or default_journal_file(input_file), resume=resume)
         
-        # En-têtes
-        sheet_output.append(['Ligne', 'URL', 'Contact Général', 'Mail Pédagogique', 'Mail Administratif', 'Statut', 'Timestamp'])
+        print(f"Traitement de {max_row - start_row + 1 if max_row else '?'} lignes à partir de la ligne {start_row} ({max_workers} requêtes simultanées)")
+        if resume:
+            print(f"Reprise depuis {journal.path} : {len(journal.finished)} lignes déjà terminées")
         
-        # Compter le nombre total de lignes
-        max_row = sheet_input.max_row
-        print(f"Traitement de {max_row - start_row + 1} lignes à partir de la ligne {start_row}")
+        total = max_row - start_row + 1 - len(journal.finished) if max_row else None
+        run_metrics = enable_metrics(metrics_file or default_metrics_file(input_file), total, progress)
         
-        processed_count = 0
-        error_count = 0
+        # URLs normalisées et hôtes résolus par lots avant les téléchargements
+        rows = (row for row in preflight.triage(input_rows) if not journal.is_finished(row[0]))
+        if shard:
+            rows = (row for row in rows if shard.contains(row[0], row[2]))
         
-        for row_num in range(start_row, max_row + 1):
-            try:
-                # Extraire l'URL de la colonne spécifiée
-                url_cell = sheet_input[f'{url_column}{row_num}']
-                url = url_cell.value if url_cell.value else ''
-                
-                if not url or 'parcoursup.fr' not in str(url):
-                    sheet_output.append([row_num, url, 'URL invalide', 'URL invalide', 'URL invalide', 'Skipped', datetime.datetime.now()])
-                    continue
-                
-                print(f"Ligne {row_num}/{max_row} - Traitement de {url}")
-                
-                # Extraire les contacts
-                general, pedagogical, admin = extract_contacts_from_url(str(url))
-                
-                # Ajouter au fichier de sortie
-                sheet_output.append([row_num, url, general, pedagogical, admin, 'Traité', datetime.datetime.now()])
-                
-                processed_count += 1
-                
-                # Sauvegarde régulière tous les 100 traitements
-                if processed_count % 100 == 0:
-                    wb_output.save(output_file)
-                    print(f"Sauvegarde automatique - {processed_count} lignes traitées")
-                
-                # Pause pour éviter la surcharge des serveurs
-                time.sleep(1)  # 1 seconde entre chaque requête
-                
-                # Pause plus longue tous les 50 appels
-                if processed_count % 50 == 0:
-                    print("Pause de 10 secondes...")
-                    time.sleep(10)
-                
-            except Exception as e:
+        # Lignes inchangées depuis le traitement précédent : recopiées sans être retraitées
+        kept_rows = deque()
+        if previous:
+            rows = keep_unchanged_rows(rows, previous, kept_rows)
+        
+        # Les requêtes partent en parallèle (débit limité par hôte dans fetch_engine),
+        # chaque résultat est journalisé dans l'ordre des lignes d'entrée
+        if parse_workers:
+            output_rows = run_pipeline(rows, max_workers, parse_workers)
+        else:
+            output_rows = map_ordered(process_row, rows, max_workers)
+        
+        for output_row in output_rows:
+            write_start = time.perf_counter()
+            journal.append(output_row)
+            run_metrics.finish_row(output_row[0], output_row[5], time.perf_counter() - write_start)
+            while kept_rows:
+                journal.append(kept_rows.popleft())
+                run_metrics.skip_row()
+            
+            status = output_row[5]
+            if status == 'Skipped':
+                continue
+            if not journal.is_finished(output_row[0]):
                 error_count += 1
-                print(f"Erreur ligne {row_num}: {e}")
-                sheet_output.append([row_num, url, 'Erreur', 'Erreur', 'Erreur', f'Erreur: {e}', datetime.datetime.now()])
                 continue
+            
+            processed_count += 1
         
-        # Sauvegarde finale
-        wb_output.save(output_file)
-        
-        print(f"\n=== TRAITEMENT TERMINÉ ===")
-        print(f"Total traité: {processed_count}")
-        print(f"Erreurs: {error_count}")
-        print(f"Fichier de sortie: {output_file}")
+        while kept_rows:
+            journal.append(kept_rows.popleft())
+            run_metrics.skip_row()
         
+    except KeyboardInterrupt:
+        print("\nInterruption - relancez avec --resume pour reprendre")
+        if shard:
+            raise
     except Exception as e:
         print(f"Erreur générale: {e}")
+        # Un shard interrompu doit être signalé en échec pour être repris (voir shards.work)
+        if shard:
+            raise
+    finally:
+        if journal:
+            journal.close()
+            # Base de résultats compacte construite à partir du journal, puis export Excel ou CSV
+            if output_format:
+                results = ResultStore.from_records(journal.iter_records())
+                results.save(default_results_file(output_file))
+                results.export(output_file)
+            print(f"\n=== TRAITEMENT TERMINÉ ===")
+            print(f"Total traité: {processed_count}")
+            print(f"Erreurs: {error_count}")
+            print(f"Journal: {journal.path}")
+            if output_format:
+                print(f"Résultats: {default_results_file(output_file)}")
+                print(f"Fichier de sortie: {output_file}")
+        if run_metrics:
+            disable_metrics()
+            print(run_metrics.summary())
+            print(f"Mesures détaillées: {run_metrics.path}")
+        if previous:
+            print(previous.report())
+        if fingerprints and fingerprints.reuse:
+            print(fingerprints.report())
+        if dedup_index:
+            print(dedup_index.report())
+        if cache:
+            print(cache.report())
+        if fetch_engine.concurrency_controller:
+            print(fetch_engine.concurrency_controller.report())
+        print(preflight.host_checker.report())
+        print(fetch_engine.dead_hosts.report())
+        disable_cache()
+        disable_fingerprints()
+        dedup.disable_dedup()
 
 if __name__ == '__main__':
-    # Configuration
-    input_file = '20250117_cartographie_for.xlsx'
-    url_column = 'O'  # Colonne O contient les URLs Parcoursup
-    start_row = 2     # Ligne de démarrage (2 si ligne 1 = en-têtes)
-    
-    print("=== DÉMARRAGE DU TRAITEMENT EN MASSE ===")
-    print(f"Fichier: {input_file}")
-    print(f"Colonne URL: {url_column}")
-    print(f"Ligne de démarrage: {start_row}")
-    print("Appuyez sur Ctrl+C pour arrêter si nécessaire")
-    
-    process_excel_bulk(input_file, url_column, start_row) 
\ No newline at end of file
+    # Fichier, colonne et réglages lus dans le profil de configuration (voir cli.py et profils.ini)
+    import cli
+    cli.main(['scrape'] + sys.argv[1:])
@@ -0,0 +1,477 @@
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlsplit
+
+from checkpoint import is_finished
+from dedup import fiche_key
+from result_store import ResultStore, default_results_file
+
+QUEUE_FILE = 'queue.sqlite'
+
+# Clés de répartition des lignes
+RANGE = 'range'              # blocs de lignes consécutives
+HASH = 'hash'                # hash stable du g_ta_cod : une fiche répétée reste dans le même shard
+
+LEASE_SECONDS = 120          # un shard sans signe de vie depuis ce délai est repris par un autre processus
+HEARTBEAT_INTERVAL = 20      # secondes entre deux signes de vie d'un processus de travail
+MAX_ATTEMPTS = 3             # tentatives par shard avant de l'abandonner
+
+# États d'un shard dans la file
+PENDING = 'en attente'
+RUNNING = 'en cours'
+DONE = 'terminé'
+FAILED = 'abandonné'
+
+
+def default_queue_dir(input_file):
+    """Dossier de la file et des journaux de shards associé à un fichier d'entrée"""
+    return f"{os.path.splitext(input_file)[0]}.shards"
+
+
+def shard_key(url):
+    """Clé de répartition d'une URL : son g_ta_cod, ou l'URL normalisée à défaut"""
+    text = str(url)
+    for name, value in parse_qsl(urlsplit(text).query):
+        if name == 'g_ta_cod':
+            return value
+    try:
+        return fiche_key(text)
+    except ValueError:
+        return text
+
+
+class Shard:
+    """Part du fichier d'entrée traitée par un processus de travail
+
+    En répartition par plages, le shard couvre les lignes first_row à last_row
+    (None : jusqu'à la fin du fichier) ; en répartition par hash, les lignes
+    dont la clé (g_ta_cod) tombe dans ce shard, où qu'elles soient.
+    """
+
+    __slots__ = ('index', 'count', 'key', 'first_row', 'last_row')
+
+    def __init__(self, index, count, key=HASH, first_row=None, last_row=None):
+        self.index = index
+        self.count = count
+        self.key = key
+        self.first_row = first_row
+        self.last_row = last_row
+
+    def contains(self, row_num, url):
+        if self.key == RANGE:
+            return row_num >= self.first_row and (self.last_row is None or row_num <= self.last_row)
+        return zlib.crc32(shard_key(url).encode('utf-8')) % self.count == self.index
+
+    def __str__(self):
+        if self.key == RANGE:
+            return f"shard {self.index + 1}/{self.count} (lignes {self.first_row} à {self.last_row or 'fin'})"
+        return f"shard {self.index + 1}/{self.count} (hash g_ta_cod)"
+
+
+def journal_file(queue_dir, index, attempt):
+    return os.path.join(queue_dir, f'shard-{index:03d}-{attempt}.journal.jsonl')
+
+
+class ShardQueue:
+    """File de travail partagée (SQLite) : paramètres du traitement et état de chaque shard
+
+    Les processus de travail, sur cette machine ou sur d'autres qui voient le
+    même dossier, réservent un shard à la fois et signalent régulièrement
+    qu'ils sont en vie. Un shard dont le processus ne donne plus de nouvelles
+    est repris par un autre ; si le premier termine malgré tout, son résultat
+    est compté comme tardif et départagé à la fusion.
+    """
+
+    def __init__(self, queue_dir):
+        self.dir = queue_dir
+        self.lock = threading.Lock()
+        os.makedirs(queue_dir, exist_ok=True)
+        # Transactions explicites : la réservation d'un shard doit être atomique entre processus
+        self.db = sqlite3.connect(os.path.join(queue_dir, QUEUE_FILE), timeout=30,
+                                  isolation_level=None, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS shards ('
+            'id INTEGER PRIMARY KEY, first_row INTEGER, last_row INTEGER, state TEXT NOT NULL, '
+            'worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, heartbeat REAL, late INTEGER NOT NULL DEFAULT 0)'
+        )
+
+    def settings(self):
+        with self.lock:
+            return {name: json.loads(value) for name, value in self.db.execute('SELECT name, value FROM settings')}
+
+    def shard(self, index):
+        settings = self.settings()
+        with self.lock:
+            first_row, last_row = self.db.execute('SELECT first_row, last_row FROM shards WHERE id = ?', (index,)).fetchone()
+        return Shard(index, settings['shards'], settings['key'], first_row, last_row)
+
+    def create(self, settings, bounds):
+        """Remplace le contenu de la file : paramètres du traitement et un shard par plage de `bounds`"""
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.execute('DELETE FROM settings')
+            self.db.execute('DELETE FROM shards')
+            self.db.executemany('INSERT INTO settings VALUES (?, ?)',
+                                [(name, json.dumps(value)) for name, value in settings.items()])
+            self.db.executemany('INSERT INTO shards (id, first_row, last_row, state) VALUES (?, ?, ?, ?)',
+                                [(index, first, last, PENDING) for index, (first, last) in enumerate(bounds)])
+            self.db.execute('COMMIT')
+
+    def claim(self, worker):
+        """Réserve le prochain shard disponible : renvoie (numéro, tentative) ou None"""
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.db.execute(
+                    'SELECT id, attempts FROM shards WHERE attempts < ? AND '
+                    '(state = ? OR (state = ? AND heartbeat < ?)) ORDER BY id LIMIT 1',
+                    (MAX_ATTEMPTS, PENDING, RUNNING, now - LEASE_SECONDS),
+                ).fetchone()
+                if row is not None:
+                    self.db.execute('UPDATE shards SET state = ?, worker = ?, attempts = ?, heartbeat = ? WHERE id = ?',
+                                    (RUNNING, worker, row[1] + 1, now, row[0]))
+            finally:
+                self.db.execute('COMMIT')
+        return None if row is None else (row[0], row[1] + 1)
+
+    def heartbeat(self, index, attempt):
+        with self.lock:
+            self.db.execute('UPDATE shards SET heartbeat = ? WHERE id = ? AND attempts = ? AND state = ?',
+                            (time.time(), index, attempt, RUNNING))
+
+    def complete(self, index, attempt):
+        """Marque le shard terminé ; un résultat d'une tentative dépassée est compté comme tardif"""
+        with self.lock:
+            updated = self.db.execute('UPDATE shards SET state = ? WHERE id = ? AND attempts = ? AND state = ?',
+                                      (DONE, index, attempt, RUNNING)).rowcount
+            if not updated:
+                self.db.execute('UPDATE shards SET late = late + 1 WHERE id = ?', (index,))
+        return bool(updated)
+
+    def fail(self, index, attempt):
+        """Remet le shard en attente, ou l'abandonne après MAX_ATTEMPTS tentatives"""
+        with self.lock:
+            self.db.execute('UPDATE shards SET state = CASE WHEN attempts < ? THEN ? ELSE ? END '
+                            'WHERE id = ? AND attempts = ? AND state = ?',
+                            (MAX_ATTEMPTS, PENDING, FAILED, index, attempt, RUNNING))
+
+    def reopen(self, indexes):
+        """Remet en attente des shards terminés auxquels il manque des lignes (abandonnés après MAX_ATTEMPTS)"""
+        with self.lock:
+            self.db.executemany('UPDATE shards SET state = CASE WHEN attempts < ? THEN ? ELSE ? END '
+                                'WHERE id = ? AND state = ?',
+                                [(MAX_ATTEMPTS, PENDING, FAILED, index, DONE) for index in indexes])
+
+    def release_orphans(self):
+        """Remet en attente les shards encore 'en cours' alors qu'aucun processus ne tourne plus"""
+        with self.lock:
+            return self.db.execute('UPDATE shards SET state = CASE WHEN attempts < ? THEN ? ELSE ? END WHERE state = ?',
+                                   (MAX_ATTEMPTS, PENDING, FAILED, RUNNING)).rowcount
+
+    def states(self):
+        """{état: nombre de shards} et nombre de résultats tardifs"""
+        with self.lock:
+            counts = dict(self.db.execute('SELECT state, COUNT(*) FROM shards GROUP BY state'))
+            late = self.db.execute('SELECT COALESCE(SUM(late), 0) FROM shards').fetchone()[0]
+        return counts, late
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def range_bounds(input_file, url_column, start_row, count):
+    """Découpe les lignes du fichier en `count` plages consécutives de tailles égales"""
+    from scraper_bulk import iter_url_column
+
+    max_row, rows = iter_url_column(input_file, url_column, start_row)
+    if max_row:
+        # Lecture amorcée puis arrêtée : ferme le classeur
+        next(rows, None)
+        rows.close()
+    else:
+        # Dimensions absentes du classeur : lignes comptées en flux
+        max_row = start_row - 1 + sum(1 for _ in rows)
+    size = max(-(-(max_row - start_row + 1) // count), 1)
+    bounds = [(start_row + n * size, start_row + (n + 1) * size - 1) for n in range(count)]
+    # Le dernier shard prend aussi les lignes ajoutées depuis le découpage
+    bounds[-1] = (bounds[-1][0], None)
+    return bounds
+
+
+def plan(input_file, url_column='O', start_row=2, shards=4, key=HASH, queue_dir=None, **options):
+    """Crée la file de travail d'un traitement réparti en `shards` parts ; renvoie son dossier
+
+    `options` sont transmises à process_excel_bulk par chaque processus de travail
+    (max_workers, parse_workers, deduplicate, cache_file, baseline, refresh_after...).
+    Les journaux d'un précédent découpage dans le même dossier sont supprimés.
+    """
+    queue_dir = queue_dir or default_queue_dir(input_file)
+    os.makedirs(queue_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(queue_dir, 'shard-*')):
+        os.remove(path)
+    if key == RANGE:
+        bounds = range_bounds(input_file, url_column, start_row, shards)
+    else:
+        bounds = [(None, None)] * shards
+    settings = {
+        'input_file': os.path.abspath(input_file),
+        'url_column': url_column,
+        'start_row': start_row,
+        'shards': shards,
+        'key': key,
+        'options': options,
+    }
+    queue = ShardQueue(queue_dir)
+    try:
+        queue.create(settings, bounds)
+    finally:
+        queue.close()
+    print(f"File de travail {queue_dir} : {shards} shards ({'plages de lignes' if key == RANGE else 'hash g_ta_cod'})")
+    return queue_dir
+
+
+def run_shard(queue_dir, settings, shard, attempt):
+    """Traite un shard avec process_excel_bulk ; sa sortie est écrite dans un fichier .log à côté de son journal"""
+    from scraper_bulk import process_excel_bulk
+
+    options = dict(settings['options'])
+    journal = journal_file(queue_dir, shard.index, attempt)
+    # Une nouvelle tentative reprend une copie du journal de la précédente (--resume) :
+    # seules les lignes en erreur ou restantes sont traitées
+    previous = [journal_file(queue_dir, shard.index, n) for n in range(attempt - 1, 0, -1)]
+    previous = [path for path in previous if os.path.exists(path)]
+    if previous:
+        shutil.copyfile(previous[0], journal)
+        options['resume'] = True
+    stem = journal[:-len('.journal.jsonl')]
+    with open(f'{stem}.log', 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        process_excel_bulk(settings['input_file'], settings['url_column'], settings['start_row'],
+                           journal_file=journal, metrics_file=f'{stem}.metrics.jsonl', output_format=None,
+                           shard=shard, **options)
+
+
+def work(queue_dir, worker=None):
+    """Processus de travail : traite des shards de la file jusqu'à ce qu'il n'y en ait plus de disponible"""
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    queue = ShardQueue(queue_dir)
+    settings = queue.settings()
+    try:
+        while True:
+            claim = queue.claim(worker)
+            if claim is None:
+                return
+            index, attempt = claim
+            shard = queue.shard(index)
+            stopped = threading.Event()
+
+            def keep_alive():
+                while not stopped.wait(HEARTBEAT_INTERVAL):
+                    queue.heartbeat(index, attempt)
+
+            heartbeat = threading.Thread(target=keep_alive, daemon=True)
+            heartbeat.start()
+            started = time.perf_counter()
+            try:
+                run_shard(queue_dir, settings, shard, attempt)
+            except Exception as e:
+                queue.fail(index, attempt)
+                print(f"[{worker}] {shard}, tentative {attempt} : erreur {e}")
+            else:
+                late = '' if queue.complete(index, attempt) else ' (résultat tardif, shard déjà repris)'
+                print(f"[{worker}] {shard} terminé en {time.perf_counter() - started:.1f}s{late}")
+            finally:
+                stopped.set()
+                heartbeat.join()
+    finally:
+        queue.close()
+
+
+def missing_rows(queue, merged):
+    """{numéro de shard: lignes du fichier d'entrée absentes de `merged`}, d'après la répartition de la file"""
+    from preflight import clean_url
+    from scraper_bulk import iter_url_column
+
+    settings = queue.settings()
+    shards = [queue.shard(index) for index in range(settings['shards'])]
+    _, rows = iter_url_column(settings['input_file'], settings['url_column'], settings['start_row'])
+    missing = {}
+    for row_num, value in rows:
+        if row_num in merged:
+            continue
+        # Même clé que le filtre des processus de travail (URL normalisée par preflight.triage)
+        url = clean_url(value) or value
+        for shard in shards:
+            if shard.contains(row_num, url):
+                missing.setdefault(shard.index, []).append(row_num)
+                break
+    return missing
+
+
+def merge(queue_dir, output_file=None, output_format='xlsx'):
+    """Fusionne les journaux des shards en une base de résultats ordonnée, exportée vers `output_file`
+
+    Une ligne présente dans plusieurs journaux (tentatives successives d'un même
+    shard, résultat tardif d'un processus dépassé) est départagée : un résultat
+    terminé l'emporte sur une erreur, puis le plus récent l'emporte.
+
+    Les lignes fusionnées sont comparées au fichier d'entrée : un shard marqué
+    terminé auquel il manque des lignes est signalé et remis en attente, pour
+    qu'une relance des processus de travail (ou run_local avec resume=True) le
+    complète avant une nouvelle fusion.
+    """
+    journals = sorted(glob.glob(os.path.join(queue_dir, 'shard-*.journal.jsonl')))
+    best = {}
+    duplicates = 0
+    for number, path in enumerate(journals):
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par l'arrêt brutal d'un processus
+                    record = None
+                if record is not None:
+                    candidate = (is_finished(record), record['timestamp'], number, offset)
+                    current = best.get(record['row'])
+                    if current is None:
+                        best[record['row']] = candidate
+                    else:
+                        duplicates += current[2] != number
+                        if candidate[:2] >= current[:2]:
+                            best[record['row']] = candidate
+                offset += len(line)
+
+    files = [open(path, 'rb') for path in journals]
+
+    def records():
+        for row_num in sorted(best):
+            _, _, number, offset = best[row_num]
+            files[number].seek(offset)
+            yield json.loads(files[number].readline())
+
+    if output_file is None:
+        output_file = f"contacts_extraits_{time.strftime('%Y%m%d_%H%M%S')}.{output_format}"
+    try:
+        results = ResultStore.from_records(records())
+    finally:
+        for f in files:
+            f.close()
+    results.save(default_results_file(output_file))
+    results.export(output_file)
+
+    queue = ShardQueue(queue_dir)
+    try:
+        try:
+            missing = missing_rows(queue, best)
+        except Exception as e:
+            missing = None
+            print(f"⚠️ Complétude non vérifiée, fichier d'entrée illisible : {e}")
+        if missing:
+            queue.reopen(missing)
+        states, late = queue.states()
+    finally:
+        queue.close()
+    unfinished = sum(n for state, n in states.items() if state != DONE)
+    errors = sum(1 for finished, *_ in best.values() if not finished)
+    print(f"Fusion de {len(journals)} journaux : {len(best)} lignes ({errors} en erreur), "
+          f"{duplicates} doublons départagés, {late} résultats tardifs")
+    for index, rows in sorted((missing or {}).items()):
+        sample = ', '.join(map(str, rows[:10])) + (', ...' if len(rows) > 10 else '')
+        print(f"⚠️ shard {index + 1} : {len(rows)} lignes manquantes ({sample})")
+    if unfinished:
+        print(f"⚠️ {unfinished} shards non terminés ({', '.join(f'{state} : {n}' for state, n in sorted(states.items()))}) : "
+              f"relancez des processus de travail puis la fusion")
+    print(f"Fichier de sortie: {output_file}")
+    return output_file
+
+
+def run_local(input_file, url_column='O', start_row=2, shards=4, workers=None, key=HASH, queue_dir=None,
+              output_format='xlsx', resume=False, worker=work, **options):
+    """Traitement réparti sur cette machine : découpage, `workers` processus, puis fusion
+
+    Avec `resume=True`, la file existante est reprise (shards non terminés seulement).
+    `worker` est la fonction exécutée par chaque processus (work par défaut).
+    """
+    queue_dir = queue_dir or default_queue_dir(input_file)
+    if not (resume and os.path.exists(os.path.join(queue_dir, QUEUE_FILE))):
+        plan(input_file, url_column, start_row, shards, key, queue_dir, **options)
+    workers = workers or min(shards, os.cpu_count() or 1)
+    # spawn : chaque processus démarre sans les threads ni les connexions du processus parent
+    context = multiprocessing.get_context('spawn')
+    while True:
+        processes = [context.Process(target=worker, args=(queue_dir, f'{socket.gethostname()}:local-{n}'))
+                     for n in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        # Shards laissés 'en cours' par un processus mort : relancés sans attendre l'expiration du bail
+        queue = ShardQueue(queue_dir)
+        try:
+            orphans = queue.release_orphans()
+            pending = queue.states()[0].get(PENDING, 0)
+        finally:
+            queue.close()
+        if not (orphans and pending):
+            break
+        print(f"{orphans} shards interrompus, nouvelle tentative")
+    return merge(queue_dir, output_format=output_format)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Traitement réparti en shards sur plusieurs processus ou machines")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_plan_arguments(command):
+        command.add_argument('input_file')
+        command.add_argument('--column', default='O', help="colonne des URLs")
+        command.add_argument('--start-row', type=int, default=2)
+        command.add_argument('--shards', type=int, default=4, help="nombre de parts")
+        command.add_argument('--key', choices=(HASH, RANGE), default=HASH, help="répartition par hash du g_ta_cod ou par plages de lignes")
+        command.add_argument('--queue', help="dossier de la file (par défaut à côté du fichier d'entrée)")
+        command.add_argument('--max-workers', type=int, default=8, help="requêtes simultanées par processus")
+        command.add_argument('--parse-workers', type=int, default=0)
+
+    run_parser = commands.add_parser('run', help="découper, traiter avec des processus locaux et fusionner")
+    add_plan_arguments(run_parser)
+    run_parser.add_argument('--workers', type=int, help="processus locaux (par défaut un par shard, au plus un par cœur)")
+    run_parser.add_argument('--resume', action='store_true', help="reprendre la file existante")
+    run_parser.add_argument('--csv', action='store_true')
+
+    plan_parser = commands.add_parser('plan', help="créer la file de travail (processus lancés ensuite avec 'work')")
+    add_plan_arguments(plan_parser)
+
+    work_parser = commands.add_parser('work', help="traiter des shards de la file (à lancer sur chaque machine)")
+    work_parser.add_argument('queue')
+
+    merge_parser = commands.add_parser('merge', help="fusionner les journaux des shards")
+    merge_parser.add_argument('queue')
+    merge_parser.add_argument('--output')
+    merge_parser.add_argument('--csv', action='store_true')
+    args = parser.parse_args()
+
+    if args.command in ('run', 'plan'):
+        options = {'max_workers': args.max_workers, 'parse_workers': args.parse_workers}
+        if args.command == 'run':
+            run_local(args.input_file, args.column, args.start_row, args.shards, args.workers, args.key, args.queue,
+                      'csv' if args.csv else 'xlsx', args.resume, **options)
+        else:
+            plan(args.input_file, args.column, args.start_row, args.shards, args.key, args.queue, **options)
+    elif args.command == 'work':
+        work(args.queue)
+    else:
+        merge(args.queue, args.output, 'csv' if args.csv else 'xlsx')
@@ -0,0 +1,217 @@
+import multiprocessing
+import random
+import socket
+import zlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FICHE_TEMPLATE = """<html><body>
+<h1>Fiche formation {path}</h1>
+<div class="contact">
+  <h3>Contacter et échanger avec l'établissement</h3>
+  <p>Pas d'adresse publiée.</p>
+</div>
+<a href="{official_site}">Site de l'établissement</a>
+</body></html>"""
+
+OFFICIAL_HOME_TEMPLATE = """<html><body>
+<p>Accueil : accueil@etablissement-{n}.fr</p>
+<a href="/site/{n}/formations">Nos formations</a>
+<a href="/site/{n}/nous-contacter">Nous contacter</a>
+<a href="/prive/contact-{n}">Contacts internes</a>
+<a href="/site/{n}/plaquette.pdf">Plaquette (PDF)</a>
+</body></html>"""
+
+OFFICIAL_CONTACT_TEMPLATE = """<html><body>
+<p>Scolarité : scolarite@etablissement-{n}.fr</p>
+<p>Secrétariat pédagogique : pedagogie@etablissement-{n}.fr</p>
+</body></html>"""
+
+OFFICIAL_OTHER_TEMPLATE = """<html><body><p>Page {path} sans contact (interne@etablissement-{n}.fr).</p></body></html>"""
+
+ROBOTS_TXT = "User-agent: *\nDisallow: /prive/\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Sert des fiches Parcoursup factices qui renvoient vers un site officiel factice"""
+
+    def do_GET(self):
+        if self.server.max_concurrent:
+            self.throttled_get()
+        else:
+            time.sleep(self.server.latency)
+            self.serve()
+
+    def throttled_get(self):
+        """Simule un serveur saturé : latence croissante avec la charge, 429 au-delà de max_concurrent"""
+        server = self.server
+        with server.lock:
+            server.active += 1
+            active = server.active
+        try:
+            if active > server.max_concurrent:
+                server.rejected += 1
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            time.sleep(server.latency * (1 + active / server.max_concurrent))
+            self.serve()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def serve(self):
+        content_type = 'text/html; charset=utf-8'
+        if self.path == '/robots.txt':
+            body = ROBOTS_TXT
+            content_type = 'text/plain; charset=utf-8'
+        elif self.path.startswith('/site/'):
+            # Site officiel : accueil, page de contact et autres pages
+            parts = self.path.split('/')
+            n = parts[2]
+            if len(parts) == 3 or not parts[3]:
+                body = OFFICIAL_HOME_TEMPLATE.format(n=n)
+            elif parts[3] == 'nous-contacter':
+                body = OFFICIAL_CONTACT_TEMPLATE.format(n=n)
+            else:
+                body = OFFICIAL_OTHER_TEMPLATE.format(n=n, path=self.path)
+        elif self.path.startswith('/prive/'):
+            body = OFFICIAL_OTHER_TEMPLATE.format(n=0, path=self.path)
+        else:
+            n = zlib.crc32(self.path.encode()) % 1000
+            if self.server.pages:
+                # Page de fixture dont les liens externes pointent vers le faux site officiel
+                body = self.server.pages[n % len(self.server.pages)]
+                body = body.replace('href="https://', f'href="{self.server.official_base}/site/')
+            else:
+                body = FICHE_TEMPLATE.format(path=self.path, official_site=f'{self.server.official_base}/site/{n}')
+        data = body.encode('utf-8')
+        etag = f'"{zlib.crc32(data):08x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CorpusHandler(BaseHTTPRequestHandler):
+    """Sert les réponses d'un corpus enregistré (replay.py)
+
+    L'URL d'origine est encodée dans le chemin : /https/www.exemple.fr/contact
+    correspond à https://www.exemple.fr/contact. Une fraction `error_rate` des
+    requêtes reçoit une erreur choisie parmi `error_kinds` (code HTTP ou 'reset'
+    pour une connexion coupée sans réponse).
+    """
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        server = self.server
+        time.sleep(server.latency)
+        if server.error_rate:
+            with server.lock:
+                kind = server.rng.choice(server.error_kinds) if server.rng.random() < server.error_rate else None
+            if kind is not None:
+                server.injected += 1
+                return self.inject_error(kind)
+
+        _, scheme, rest = self.path.split('/', 2)
+        entry = server.corpus.lookup(f'{scheme}://{rest}')
+        if entry is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = server.corpus.body(entry)
+        self.send_response(entry['status'])
+        for name, value in entry.get('headers', {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+    def inject_error(self, kind):
+        if kind == 'reset':
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.send_response(kind)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def start_stub_server(latency=0.05, official_base=None, pages=None, max_concurrent=0):
+    """Démarre le serveur factice dans un thread et renvoie (serveur, URL de base)
+
+    `pages` : liste de pages HTML servies à la place de la fiche générée.
+    `max_concurrent` : au-delà de ce nombre de requêtes simultanées, répond 429 (0 : illimité).
+    """
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.latency = latency
+    server.pages = pages
+    server.max_concurrent = max_concurrent
+    server.active = 0
+    server.rejected = 0
+    server.lock = threading.Lock()
+    port = server.server_address[1]
+    # "localhost" et "127.0.0.1" sont deux hôtes distincts pour le limiteur de débit
+    server.official_base = official_base or f'http://localhost:{port}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{port}'
+
+
+def start_corpus_server(corpus, latency=0.05, error_rate=0.0, error_kinds=(500, 503, 'reset'), seed=0):
+    """Démarre un serveur local qui rejoue un corpus enregistré ; renvoie (serveur, URL de base)
+
+    Les erreurs injectées sont tirées d'un générateur initialisé par `seed` (reproductible).
+    """
+    server = StubServer(('127.0.0.1', 0), CorpusHandler)
+    server.corpus = corpus
+    server.latency = latency
+    server.error_rate = error_rate
+    server.error_kinds = error_kinds
+    server.rng = random.Random(seed)
+    server.injected = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def _serve_in_process(kwargs, queue, start=start_stub_server):
+    server, base_url = start(**kwargs)
+    queue.put(base_url)
+    threading.Event().wait()
+
+
+def start_stub_server_process(start=start_stub_server, **kwargs):
+    """Démarre le serveur factice dans un processus séparé (pour ne pas fausser les mesures CPU)
+
+    `start` : start_stub_server ou start_corpus_server.
+    Renvoie (processus, URL de base) ; arrêter avec process.terminate().
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_in_process, args=(kwargs, queue, start), daemon=True)
+    process.start()
+    return process, queue.get()